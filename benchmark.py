@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from lottery_engine import LotteryEngine
+
+
+# 抽奖核心性能测试: 生成指定规模的参与者和奖项, 在无界面的LotteryEngine上测量各热点操作
+# 用法: python benchmark.py --sizes 1000 100000 1000000 --label v1.2 --compare benchmark_v1.1.json
+
+
+def make_dataset(folder, size, award_count, quota, use_csv=False):
+    # use_csv时参与者写成participants.csv(引擎同样支持), 生成和读取百万行Excel需要几分钟
+    os.makedirs(folder, exist_ok=True)
+    participants = pd.DataFrame({'Name': [f'{i}-参与者' for i in range(1, size + 1)]})
+    awards = pd.DataFrame({'Award': [f'奖项{i}' for i in range(1, award_count + 1)], 'Quota': [quota] * award_count})
+    if use_csv:
+        participants.to_csv(os.path.join(folder, 'participants.csv'), index=False)
+    else:
+        participants.to_excel(os.path.join(folder, 'participants.xlsx'), index=False, engine='openpyxl')
+    awards.to_excel(os.path.join(folder, 'awards.xlsx'), index=False, engine='openpyxl')
+
+
+def summarize(samples, peak_bytes):
+    samples = sorted(samples)
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))]
+    return {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p50_ms': percentile(50) * 1000,
+        'p90_ms': percentile(90) * 1000,
+        'p99_ms': percentile(99) * 1000,
+        'max_ms': samples[-1] * 1000,
+        'peak_mb': peak_bytes / 1024 / 1024
+    }
+
+
+def measure(func, repeat, trace_memory=True):
+    # 返回每次调用耗时和调用期间的内存峰值, tracemalloc本身会让耗时变长, 需要精确耗时时可关闭
+    samples = []
+    if trace_memory:
+        tracemalloc.start()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    peak = 0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return summarize(samples, peak)
+
+
+def run_size(size, args):
+    random.seed(args.seed)
+    trace_memory = not args.no_memory
+    folder = tempfile.mkdtemp(prefix=f'lottery_bench_{size}_')
+    results = {}
+    try:
+        quota = max(1, min(size // 2, args.draws * args.draw_count) // args.awards + 1)
+        make_dataset(folder, size, args.awards, quota, use_csv=size > args.load_max)
+        engine = LotteryEngine(folder)
+        # 抽奖结果由每次读取数据时的种子决定, 用固定的种子来源使每次测试抽中的人相同
+        engine.seed_source = random.Random(args.seed)
+
+        if size <= args.load_max:
+            # 第一次读取需要解析Excel, 之后命中缓存
+            results['load_cold'] = measure(lambda: engine.load(folder), 1, trace_memory)
+            results['load_warm'] = measure(lambda: engine.load(folder), args.repeat, trace_memory)
+        else:
+            # 超过load_max时从participants.csv读取, 不测量读取耗时
+            engine.load(folder)
+            results['load_cold'] = results['load_warm'] = None
+
+        awards = engine.award_names()
+        draws = iter(range(args.draws))
+        def draw():
+            award = awards[next(draws) % len(awards)]
+            engine.draw(award, min(args.draw_count, engine.remaining(award)))
+        results['draw'] = measure(draw, min(args.draws, quota * len(awards) // args.draw_count), trace_memory)
+        results['status'] = measure(engine.status, args.repeat, trace_memory)
+
+        # 结果页刷新时按行号取出中奖者(只测量数据查询, 不包括Treeview绘制)
+        winner_ids = list(engine.winners.index)
+        def results_rows():
+            for winner_id in winner_ids[-args.results_rows:]:
+                engine.winners.loc[winner_id]
+        results['winner_lookup'] = measure(results_rows, max(1, args.repeat // 10), trace_memory)
+
+        def revoke():
+            row = engine.winners.iloc[-1]
+            engine.revoke(row['Award'], row['Name'])
+        results['revoke'] = measure(revoke, min(args.repeat, len(engine.winners)), trace_memory)
+        results['save'] = measure(engine.save, 1, trace_memory)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def print_results(label, all_results, baseline=None):
+    print(f'== {label} ==')
+    for size, results in all_results.items():
+        print(f'-- {size} 人 --')
+        for operation, stats in results.items():
+            if stats is None:
+                print(f'{operation:>14}: 跳过')
+                continue
+            line = (f"{operation:>14}: n={stats['count']:<5} mean={stats['mean_ms']:9.3f}ms p50={stats['p50_ms']:9.3f}ms "
+                    f"p99={stats['p99_ms']:9.3f}ms max={stats['max_ms']:9.3f}ms peak={stats['peak_mb']:8.2f}MB")
+            old = (baseline or {}).get(size, {}).get(operation)
+            if old:
+                line += f"  p99对比基准 x{stats['p99_ms'] / max(old['p99_ms'], 1e-9):.2f}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='抽奖软件性能测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000], help='参与者人数')
+    parser.add_argument('--awards', type=int, default=10, help='奖项数量')
+    parser.add_argument('--draws', type=int, default=200, help='抽奖次数')
+    parser.add_argument('--draw-count', type=int, default=10, help='每次抽取人数')
+    parser.add_argument('--repeat', type=int, default=100, help='status/revoke等操作的重复次数')
+    parser.add_argument('--results-rows', type=int, default=1000, help='winner_lookup每次按行号读取的中奖者数')
+    parser.add_argument('--load-max', type=int, default=100000, help='超过该人数时参与者改用csv并跳过读取测试(生成和解析Excel很慢)')
+    parser.add_argument('--no-memory', action='store_true', help='不统计内存峰值, 耗时更准确')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', default='current', help='本次结果的标签, 例如版本号')
+    parser.add_argument('--output', default=None, help='结果保存路径, 默认benchmark_<label>.json')
+    parser.add_argument('--compare', default=None, help='与之前保存的结果对比')
+    args = parser.parse_args()
+
+    all_results = {str(size): run_size(size, args) for size in args.sizes}
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_results(args.label, all_results, baseline)
+
+    output = args.output or f'benchmark_{args.label}.json'
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'label': args.label, 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'args': vars(args),
+                   'results': all_results}, f, ensure_ascii=False, indent=2)
+    print(f'结果已保存到{output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+
+
+# 局域网广播服务: 在后台线程中运行asyncio事件循环, 通过WebSocket把滚动名单和中奖结果推送给各个大屏和手机
+# Tk线程只调用publish把消息交给后台线程, 序列化和发送都不占用界面事件循环
+# 用法: 浏览器打开 http://<本机IP>:<端口>/ 即可显示; python broadcast_server.py --clients 500 可用本地客户端测试
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+PAGE = '''<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>抽奖结果</title>
+<style>
+body { margin: 0; background: #1b1b2f; color: #fff; font-family: sans-serif; text-align: center; }
+#award { font-size: 6vw; margin-top: 8vh; color: #ffd369; }
+#names { font-size: 7vw; margin: 6vh 4vw; word-break: break-all; }
+#message { font-size: 3vw; }
+#status { position: fixed; bottom: 2vh; width: 100%; font-size: 2vw; color: #aaa; white-space: pre-line; }
+</style>
+</head>
+<body>
+<div id="award"></div>
+<div id="names"></div>
+<div id="message"></div>
+<div id="status">正在连接...</div>
+<script>
+function connect() {
+    var socket = new WebSocket((location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host + '/ws');
+    socket.onmessage = function (event) {
+        var data = JSON.parse(event.data);
+        if (data.type === 'rolling' || data.type === 'result') {
+            document.getElementById('award').textContent = data.award;
+            document.getElementById('names').textContent = data.names.join(', ');
+            document.getElementById('message').textContent = data.type === 'result' ? '恭喜以上' + data.names.length + '人获得' + data.award : '';
+        } else if (data.type === 'status') {
+            document.getElementById('status').textContent = '已中奖' + data.winner_count + '人, 未中奖' + data.not_win_count + '人\\n' +
+                data.awards.map(function (a) { return a[0] + ' ' + a[2] + '/' + a[1]; }).join('  ');
+        }
+    };
+    socket.onclose = function () {
+        document.getElementById('status').textContent = '连接已断开, 正在重连...';
+        setTimeout(connect, 2000);
+    };
+}
+connect();
+</script>
+</body>
+</html>
+'''
+
+
+def encode_frame(payload, opcode=0x1):
+    # 服务器发送的帧不需要掩码
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_frame(reader):
+    # 返回(opcode, payload), 客户端发送的帧带掩码
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def to_json(data):
+    # numpy整数等类型转换为普通数字
+    return json.dumps(data, ensure_ascii=False, default=lambda o: o.item() if hasattr(o, 'item') else str(o))
+
+
+class BroadcastServer:
+    # publish可以在任意线程调用; 新连接的客户端先收到每种消息的最新一条, 之后实时接收
+    # 滚动名单只保留最新状态, 客户端网络慢时直接丢弃旧的滚动帧, 积压过多时断开该客户端
+
+    def __init__(self, host='0.0.0.0', port=8765, max_buffer=256 * 1024):
+        self.host = host
+        self.port = port
+        self.max_buffer = max_buffer # 单个客户端允许积压的字节数
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.clients = set() # 已连接的WebSocket客户端
+        self.latest = {} # 每种消息的最新一条(已编码的帧)
+        self.ready = threading.Event()
+        self.error = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive() and self.error is None
+
+    def start(self, timeout=5):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait(timeout)
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, self.host, self.port, backlog=1024))
+        except OSError as e:
+            self.error = e
+            self.ready.set()
+            self.loop.close()
+            return
+        # 端口为0时使用系统分配的端口
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            for writer in list(self.clients):
+                writer.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+    def stop(self):
+        if self.running:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(2)
+
+    def publish(self, kind, **data):
+        # kind: rolling(滚动名单), result(中奖结果), status(奖项状态)
+        if self.running:
+            self.loop.call_soon_threadsafe(self.broadcast, kind, data)
+
+    def broadcast(self, kind, data):
+        data['type'] = kind
+        data['time'] = time.time()
+        frame = encode_frame(to_json(data).encode('utf-8'))
+        self.latest[kind] = frame
+        for writer in list(self.clients):
+            self.send(writer, frame, droppable=kind == 'rolling')
+
+    def send(self, writer, frame, droppable=False):
+        buffered = writer.transport.get_write_buffer_size()
+        if buffered > self.max_buffer:
+            # 客户端长时间不接收, 断开后由页面自动重连
+            self.clients.discard(writer)
+            writer.transport.abort()
+        elif droppable and buffered > 0:
+            return # 上一帧还没发出去, 跳过这一滚动帧
+        else:
+            writer.write(frame)
+
+    async def handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 10)
+            lines = request.decode('latin-1').split('\r\n')
+            path = lines[0].split(' ')[1]
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    key, value = line.split(':', 1)
+                    headers[key.strip().lower()] = value.strip()
+            if headers.get('upgrade', '').lower() == 'websocket':
+                await self.handle_websocket(reader, writer, headers)
+            elif path == '/':
+                self.respond(writer, '200 OK', 'text/html; charset=utf-8', PAGE.encode('utf-8'))
+            elif path == '/state':
+                state = b'[' + b','.join(frame[self.header_size(frame):] for frame in self.latest.values()) + b']'
+                self.respond(writer, '200 OK', 'application/json; charset=utf-8', state)
+            else:
+                self.respond(writer, '404 Not Found', 'text/plain', b'not found')
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError, IndexError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    @staticmethod
+    def header_size(frame):
+        length = frame[1] & 0x7F
+        return 2 + {126: 2, 127: 8}.get(length, 0)
+
+    @staticmethod
+    def respond(writer, status, content_type, body):
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                     f'Cache-Control: no-cache\r\nConnection: close\r\n\r\n'.encode('latin-1') + body)
+
+    async def handle_websocket(self, reader, writer, headers):
+        key = headers.get('sec-websocket-key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                      f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode('latin-1'))
+        for frame in self.latest.values():
+            writer.write(frame)
+        self.clients.add(writer)
+        while True:
+            opcode, payload = await read_frame(reader)
+            if opcode == 0x8:
+                writer.write(encode_frame(payload[:2], 0x8))
+                return
+            if opcode == 0x9:
+                writer.write(encode_frame(payload, 0xA))
+
+
+async def run_clients(port, count, messages):
+    # 本地压力测试: count个WebSocket客户端同时连接, 统计每条消息从发布到所有客户端收到的延迟
+    latencies = []
+
+    async def client():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f'GET /ws HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                      f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n').encode('latin-1'))
+        await reader.readuntil(b'\r\n\r\n')
+        received = 0
+        while received < messages:
+            _, payload = await read_frame(reader)
+            data = json.loads(payload)
+            if data['type'] == 'result':
+                latencies.append(time.time() - data['time'])
+                received += 1
+        writer.close()
+
+    return await asyncio.gather(*(client() for _ in range(count))), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='抽奖结果广播服务')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=0, help='启动本地测试客户端的数量, 0表示只运行服务')
+    parser.add_argument('--messages', type=int, default=100, help='测试时发布的消息数')
+    args = parser.parse_args()
+
+    server = BroadcastServer(args.host, args.port)
+    server.start()
+    print(f'广播服务已启动: http://{args.host}:{server.port}/')
+    if not args.clients:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.stop()
+        return
+
+    def publish():
+        # 等待客户端全部连接后开始发布, 期间穿插滚动帧
+        while len(server.clients) < args.clients:
+            time.sleep(0.01)
+        for i in range(args.messages):
+            server.publish('rolling', award='测试奖', names=[f'滚动{i}'])
+            server.publish('result', award='测试奖', names=[f'中奖者{i}'])
+            time.sleep(0.01)
+
+    threading.Thread(target=publish, daemon=True).start()
+    start = time.perf_counter()
+    _, latencies = asyncio.run(run_clients(server.port, args.clients, args.messages))
+    elapsed = time.perf_counter() - start
+    server.stop()
+    latencies.sort()
+    print(f'{args.clients}个客户端共收到{len(latencies)}条结果, 用时{elapsed:.2f}s, '
+          f'延迟p50={latencies[len(latencies) // 2] * 1000:.1f}ms p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms '
+          f'max={latencies[-1] * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
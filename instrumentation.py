@@ -0,0 +1,189 @@
+import bisect
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import time
+from collections import deque
+
+
+# 界面事件处理函数的耗时统计: 每个处理函数一个固定分桶的直方图, 关闭时包装函数只多一次判断
+# 以及按快捷键对下一次抽奖做一次cProfile性能分析, 和检测Tk事件循环卡顿的心跳探针
+
+BUCKET_BOUNDS_MS = [0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+class HandlerTimer:
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled # 是否记录直方图
+        self.tracking = False # 是否记录最慢的处理函数, 供LagMonitor判断卡顿原因
+        self.histograms = {} # 处理函数名 -> 各分桶次数(最后一个桶为超过最大边界)
+        self.totals = {} # 处理函数名 -> [次数, 总耗时ms, 最大耗时ms]
+        self.current = None # 正在执行的处理函数名
+        self.slowest = None # 上次take_slowest之后最慢的一次调用: (耗时ms, 处理函数名)
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not (self.enabled or self.tracking):
+                return func(*args, **kwargs)
+            outer = self.current
+            self.current = name
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.current = outer
+                if self.enabled:
+                    self.record(name, elapsed_ms)
+                if self.slowest is None or elapsed_ms > self.slowest[0]:
+                    self.slowest = (elapsed_ms, name)
+        return wrapper
+
+    def take_slowest(self):
+        slowest, self.slowest = self.slowest, None
+        return slowest
+
+    def instrument(self, target, names):
+        # 用带计时的包装替换对象上的方法, 需要在绑定事件和创建回调之前调用
+        for name in names:
+            setattr(target, name, self.wrap(name, getattr(target, name)))
+
+    def record(self, name, elapsed_ms):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+            self.totals[name] = [0, 0.0, 0.0]
+        histogram[bisect.bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+        totals = self.totals[name]
+        totals[0] += 1
+        totals[1] += elapsed_ms
+        totals[2] = max(totals[2], elapsed_ms)
+
+    def percentile(self, name, p):
+        # 返回第p百分位所在分桶的上界(ms)
+        histogram = self.histograms[name]
+        target = self.totals[name][0] * p / 100
+        seen = 0
+        for i, count in enumerate(histogram):
+            seen += count
+            if count and seen >= target:
+                return BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else self.totals[name][2]
+        return 0
+
+    def summary(self):
+        result = {}
+        for name, (count, total, max_ms) in self.totals.items():
+            result[name] = {
+                'count': count,
+                'mean_ms': total / count,
+                'p50_ms': self.percentile(name, 50),
+                'p90_ms': self.percentile(name, 90),
+                'p99_ms': self.percentile(name, 99),
+                'max_ms': max_ms,
+                'buckets': dict(zip([f'<={bound}ms' for bound in BUCKET_BOUNDS_MS] + [f'>{BUCKET_BOUNDS_MS[-1]}ms'],
+                                    self.histograms[name]))
+            }
+        return result
+
+    def dump(self, file_path, extra=None):
+        # extra为一起保存的其他统计, 例如事件循环延迟
+        if not self.totals:
+            return None
+        data = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'handlers': self.summary()}
+        data.update(extra or {})
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return file_path
+
+
+class LagMonitor:
+    # 心跳探针: 每interval毫秒用after()调度一次, 实际触发时间比计划晚多少就是事件循环的延迟
+    # 延迟超过stall_ms时记为一次卡顿, 归因于这段时间内最慢的处理函数
+
+    def __init__(self, widget, timer, interval=50, stall_ms=100, callback=None):
+        self.widget = widget
+        self.timer = timer
+        self.interval = interval # 心跳间隔(ms)
+        self.stall_ms = stall_ms # 超过该延迟算卡顿
+        self.callback = callback # 每次心跳后调用callback(monitor)
+        self.job = None
+        self.expected = None # 下一次心跳的计划时刻
+        self.current_lag_ms = 0
+        self.worst_lag_ms = 0
+        self.stalls = deque(maxlen=100) # 最近的卡顿: {'time', 'lag_ms', 'handler', 'handler_ms'}
+        self.stall_count = 0
+        self.ticks = 0 # 心跳次数
+
+    def start(self):
+        self.stop()
+        self.timer.tracking = True
+        self.timer.take_slowest()
+        self.expected = time.monotonic() + self.interval / 1000
+        self.job = self.widget.after(self.interval, self.tick)
+
+    def stop(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+        self.timer.tracking = False
+
+    def tick(self):
+        now = time.monotonic()
+        self.ticks += 1
+        lag_ms = max(0.0, (now - self.expected) * 1000)
+        self.current_lag_ms = lag_ms
+        self.worst_lag_ms = max(self.worst_lag_ms, lag_ms)
+        slowest = self.timer.take_slowest()
+        if lag_ms >= self.stall_ms:
+            # 没有经过计时包装的代码(例如垃圾回收或其他after回调)造成的卡顿无法归因
+            handler_ms, handler = slowest if slowest else (0, '未知')
+            self.stalls.append({'time': time.strftime('%H:%M:%S'), 'lag_ms': lag_ms, 'handler': handler, 'handler_ms': handler_ms})
+            self.stall_count += 1
+        self.expected = now + self.interval / 1000
+        self.job = self.widget.after(self.interval, self.tick)
+        if self.callback is not None:
+            self.callback(self)
+
+    @property
+    def last_stall(self):
+        return self.stalls[-1] if self.stalls else None
+
+    def summary(self):
+        return {'worst_lag_ms': self.worst_lag_ms, 'stall_count': self.stall_count, 'stalls': list(self.stalls)}
+
+
+class DrawProfiler:
+    # arm后下一次抽奖从开始滚动到出结果的全过程用cProfile记录, 保存为.prof和按累计耗时排序的文本
+
+    def __init__(self):
+        self.armed = False
+        self.profile = None
+
+    def arm(self):
+        self.armed = True
+
+    def start(self):
+        if not self.armed or self.profile is not None:
+            return
+        self.armed = False
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self, folder):
+        # 返回保存的文件路径, 没有在记录时返回None
+        if self.profile is None:
+            return None
+        self.profile.disable()
+        profile, self.profile = self.profile, None
+        base_path = os.path.join(folder, time.strftime('draw_profile_%Y%m%d_%H%M%S'))
+        profile.dump_stats(base_path + '.prof')
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(40)
+        with open(base_path + '.txt', 'w', encoding='utf-8') as f:
+            f.write(text.getvalue())
+        return base_path + '.prof'
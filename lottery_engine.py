@@ -0,0 +1,1501 @@
+import json
+import pandas as pd
+import os
+import random
+import pickle
+import hashlib
+import threading
+import time
+import sqlite3
+import socket
+from io import StringIO
+
+
+def read_excel_cached(file_path, reader=None):
+    # 读取Excel并在数据文件夹的.cache中保存二进制缓存, 文件未变化时直接读取缓存, 跳过openpyxl解析
+    # reader为实际读取文件的函数, 默认pd.read_excel
+    cache_folder = os.path.join(os.path.dirname(file_path), '.cache')
+    cache_path = os.path.join(cache_folder, os.path.basename(file_path) + '.pkl')
+    stat = os.stat(file_path)
+    cache = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        except Exception:
+            cache = None # 缓存损坏时重新生成
+    if cache and cache['source'] == os.path.abspath(file_path):
+        if cache['mtime_ns'] == stat.st_mtime_ns and cache['size'] == stat.st_size:
+            return cache['data'].copy()
+
+    content_hash = file_sha1(file_path)
+    if cache and cache['source'] == os.path.abspath(file_path) and cache['sha1'] == content_hash:
+        data = cache['data'] # 仅修改时间变化, 内容未变
+    else:
+        data = (reader or pd.read_excel)(file_path)
+    write_excel_cache(file_path, data, content_hash)
+    return data.copy()
+
+
+def file_sha1(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def write_excel_cache(file_path, data, content_hash=None):
+    # 保存Excel文件对应的二进制缓存; 程序自己写出的Excel可以直接用写入的数据生成缓存, 下次读取时不需要再解析
+    cache_folder = os.path.join(os.path.dirname(file_path), '.cache')
+    cache_path = os.path.join(cache_folder, os.path.basename(file_path) + '.pkl')
+    stat = os.stat(file_path)
+    cache = {
+        'source': os.path.abspath(file_path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha1': content_hash or file_sha1(file_path),
+        'data': data
+    }
+    try:
+        os.makedirs(cache_folder, exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}-{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass # 缓存写入失败不影响正常读取
+
+
+def read_table_chunked(file_path, progress=None, chunk_size=10000):
+    # 分块读取xlsx(openpyxl只读模式)或csv, 每读完一块调用progress(已读行数, 总行数)
+    chunks = []
+    if file_path.lower().endswith('.csv'):
+        with open(file_path, 'rb') as f:
+            total = max(0, sum(1 for _ in f) - 1)
+        done = 0
+        for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+            chunks.append(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    else:
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            total = max(0, (sheet.max_row or 1) - 1)
+            rows = sheet.iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            while True:
+                block = [row for _, row in zip(range(chunk_size), rows)]
+                if not block:
+                    break
+                chunks.append(pd.DataFrame(block, columns=header))
+                if progress:
+                    progress(sum(len(chunk) for chunk in chunks), total)
+        finally:
+            workbook.close()
+        if not chunks:
+            chunks.append(pd.DataFrame(columns=header))
+    data = pd.concat(chunks, ignore_index=True)
+    # 与pd.read_excel一致, 去掉读取到的全空行
+    return data.dropna(how='all').reset_index(drop=True)
+
+
+class CounterRandom(random.Random):
+    # 基于计数器的随机数流(SplitMix64): 第i个输出只由种子和i决定, 从任意计数器位置开始都可以完全重现
+    # 重写了random和getrandbits, random.Random的sample/randrange等方法都从这里取随机数
+
+    MASK = (1 << 64) - 1
+    DRAW_SPAN = 1 << 32 # 每次抽奖占用的计数器区间, 第k次抽奖从k * DRAW_SPAN开始
+
+    def __init__(self, seed, offset=0):
+        super().__init__(seed)
+        self.counter = offset
+
+    @classmethod
+    def for_draw(cls, seed, sequence):
+        # 一次读取数据后的第sequence次抽奖使用的随机数流
+        return cls(seed, sequence * cls.DRAW_SPAN)
+
+    def seed(self, a=None, version=2):
+        self.key = int(a or 0) & self.MASK
+        self.counter = 0
+
+    def next64(self):
+        self.counter += 1
+        z = (self.key + self.counter * 0x9E3779B97F4A7C15) & self.MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & self.MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & self.MASK
+        return z ^ (z >> 31)
+
+    def random(self):
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k):
+        bits = 0
+        for shift in range(0, k, 64):
+            bits |= self.next64() << shift
+        return bits & ((1 << k) - 1)
+
+    def getstate(self):
+        return (self.key, self.counter)
+
+    def setstate(self, state):
+        self.key, self.counter = state
+
+
+def seed_digest(seed):
+    # 读取数据时只记录种子的摘要, 种子在关闭或下一次读取时才公开, 之前无法据此预测抽奖结果
+    return hashlib.sha256(str(seed).encode('ascii')).hexdigest()
+
+
+class AliasTable:
+    # Vose别名表: O(n)建表, 之后按权重抽取一个元素为O(1)
+
+    def __init__(self, items, weights):
+        self.items = list(items)
+        weights = list(weights)
+        count = len(self.items)
+        self.total = float(sum(weights))
+        self.prob = [1.0] * count
+        self.alias = list(range(count))
+        if count == 0 or self.total <= 0:
+            self.items = []
+            return
+        scaled = [weight * count / self.total for weight in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] += scaled[s] - 1
+            (small if scaled[l] < 1 else large).append(l)
+
+    def __len__(self):
+        return len(self.items)
+
+    def pick(self, rng=random):
+        i = rng.randrange(len(self.items))
+        return self.items[i] if rng.random() < self.prob[i] else self.items[self.alias[i]]
+
+
+class ParticipantPool:
+    # 可抽奖人员索引池: 用数组+位置字典保存未中奖人员, 中奖/撤销时增量更新, 抽样只需O(k)
+    # 有权重时用别名表抽样, 已中奖人员被拒绝重抽, 有效权重不足一半时才重建别名表
+    # 建表之后放回(撤销/重置)的人员放在小的附加别名表中, 按两个表的总权重选择从哪个表抽取, 不需要重建主表
+
+    def __init__(self, names=(), winner_names=(), weights=None, groups=None):
+        self.roster = list(dict.fromkeys(names)) # 所有参与者(去重)
+        self.roster_set = set(self.roster)
+        self.names = [] # 未中奖参与者
+        self.positions = {} # 名字 -> 在names中的位置
+        self.win_counts = {} # 名字 -> 中奖次数
+        self.weights = weights # 名字 -> 权重, None表示等概率
+        self.eligible_weight = 0.0 # 未中奖人员的权重之和
+        self.alias_table = None # 未中奖人员的别名表, 人员变化后不立即重建
+        self.alias_members = set() # 建表时在别名表中的人员
+        self.extra_names = [] # 建表之后放回且不在别名表中的人员
+        self.extra_weight = 0.0 # extra_names的权重之和
+        self.extra_table = None # extra_names的别名表, 有人员放回后重建
+        self.roster_alias_table = None # 所有人员的别名表
+        self.groups = groups or {} # 名字 -> 组(部门)
+        self.group_pools = {} # 组 -> 该组人员的子索引池, 与本索引池同步更新
+        for name in self.roster:
+            self.add(name)
+        members = {}
+        for name in self.roster:
+            if name in self.groups:
+                members.setdefault(self.groups[name], []).append(name)
+        for group, group_names in members.items():
+            self.group_pools[group] = ParticipantPool(group_names, (), weights)
+        self.mark_won(winner_names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def add(self, name):
+        if name in self.positions or name not in self.roster_set:
+            return
+        self.positions[name] = len(self.names)
+        self.names.append(name)
+        if self.weights is not None:
+            self.eligible_weight += self.weight(name)
+            if self.alias_table is not None and name not in self.alias_members:
+                self.alias_members.add(name)
+                self.extra_names.append(name)
+                self.extra_weight += self.weight(name)
+                self.extra_table = None
+
+    def remove(self, name):
+        # 用最后一个元素填补空位, 删除为O(1)
+        position = self.positions.pop(name, None)
+        if position is None:
+            return
+        last_name = self.names.pop()
+        if position < len(self.names):
+            self.names[position] = last_name
+            self.positions[last_name] = position
+        if self.weights is not None:
+            self.eligible_weight -= self.weight(name)
+
+    def weight(self, name):
+        return self.weights.get(name, 1.0) if self.weights is not None else 1.0
+
+    def has_won(self, name):
+        return self.win_counts.get(name, 0) > 0
+
+    def mark_won(self, names):
+        for name in names:
+            self.win_counts[name] = self.win_counts.get(name, 0) + 1
+            self.remove(name)
+            if self.groups.get(name) in self.group_pools:
+                self.group_pools[self.groups[name]].mark_won([name])
+
+    def mark_revoked(self, names):
+        for name in names:
+            count = self.win_counts.get(name, 0) - 1
+            if count > 0:
+                self.win_counts[name] = count
+            else:
+                self.win_counts.pop(name, None)
+                self.add(name)
+            if self.groups.get(name) in self.group_pools:
+                self.group_pools[self.groups[name]].mark_revoked([name])
+
+    def reset(self):
+        # 清空中奖记录: 只把已中奖人员放回索引池, 不重建整个索引池
+        for name in list(self.win_counts):
+            self.add(name)
+        self.win_counts = {}
+        for pool in self.group_pools.values():
+            pool.reset()
+
+    def group_size(self, group, from_all=False):
+        pool = self.group_pools.get(group)
+        if pool is None:
+            return 0
+        return len(pool.roster) if from_all else len(pool)
+
+    def sample_groups(self, plan, exclude=(), from_all=False, rng=random):
+        # 分层抽样: plan为{组: 人数}, 每组在自己的子索引池中抽样, 一次完成所有组
+        return {group: self.group_pools[group].sample(n, exclude, from_all, rng) for group, n in plan.items() if n > 0}
+
+    def sample(self, n, exclude=(), from_all=False, rng=random):
+        # 随机抽取n个不重复的名字, exclude中的名字不参与抽取; rng为随机数来源, 抽奖时使用可重现的CounterRandom
+        source = self.roster if from_all else self.names
+        exclude = set(exclude)
+        if self.weights is not None:
+            return self.weighted_sample(n, exclude, from_all, rng)
+        # 多抽取exclude数量的候选, 过滤后仍然保证是均匀随机
+        picks = rng.sample(range(len(source)), min(len(source), n + len(exclude)))
+        selected = [source[i] for i in picks if source[i] not in exclude][:n]
+        if len(selected) < n:
+            raise ValueError(f'可抽奖人数不足{n}人')
+        return selected
+
+    def weighted_sample(self, n, exclude, from_all, rng=random):
+        # 按权重不放回抽样: 从别名表O(1)抽取, 不符合条件(已中奖/被排除/已抽中)的拒绝后重抽
+        if from_all:
+            if self.roster_alias_table is None:
+                self.roster_alias_table = AliasTable(self.roster, map(self.weight, self.roster))
+            table = self.roster_alias_table
+        else:
+            table_weight = self.alias_table.total + self.extra_weight if self.alias_table is not None else 0
+            # 有效权重不足一半, 或者放回的人员比主表还多时重建
+            if self.alias_table is None or self.eligible_weight < table_weight * 0.5 or self.extra_weight > self.alias_table.total:
+                self.alias_table = AliasTable(self.names, map(self.weight, self.names))
+                self.alias_members = set(self.names)
+                self.extra_names = []
+                self.extra_weight = 0.0
+                self.extra_table = None
+            elif self.extra_names and self.extra_table is None:
+                self.extra_table = AliasTable(self.extra_names, map(self.weight, self.extra_names))
+            table = self.alias_table
+        selected = []
+        chosen = set()
+        attempts = 0
+        while len(selected) < n:
+            if not len(table) or attempts > 20 * n + 100:
+                # 拒绝次数过多, 只用剩余的有效人员临时建表
+                candidates = [name for name in (self.roster if from_all else self.names)
+                              if name not in exclude and name not in chosen and self.weight(name) > 0]
+                if len(candidates) < n - len(selected):
+                    raise ValueError(f'可抽奖人数不足{n}人')
+                table = AliasTable(candidates, map(self.weight, candidates))
+                attempts = 0
+            if table is self.alias_table and self.extra_weight > 0 and \
+                    rng.random() * (table.total + self.extra_weight) >= table.total:
+                # 按两个表总权重的比例从附加表抽取
+                name = self.extra_table.pick(rng)
+            else:
+                name = table.pick(rng)
+            attempts += 1
+            if name in chosen or name in exclude or not (from_all or name in self.positions):
+                continue
+            chosen.add(name)
+            selected.append(name)
+        return selected
+
+
+class AwardLedger:
+    # 奖项配额台账: 记录每个奖项的配额和已抽取人数以及人数汇总, 抽奖/撤销时O(1)更新, 不再扫描DataFrame
+    # awards.xlsx中可选DepartmentQuota列为每个部门的名额, DepartmentQuota:部门名 列可单独设置某个部门的名额
+
+    def __init__(self, awards=None, winners=None, pool=None):
+        self.pool = pool if pool is not None else ParticipantPool()
+        self.quotas = {} # 奖项 -> 配额
+        self.used = {} # 奖项 -> 已抽取人数
+        self.group_quotas = {} # 分组奖项 -> {组: 配额}
+        self.group_used = {} # (奖项, 组) -> 已抽取人数
+        if awards is not None:
+            groups = list(self.pool.group_pools)
+            for _, row in awards.iterrows():
+                award = row['Award']
+                group_quotas = {}
+                if groups and pd.notna(row.get('DepartmentQuota')):
+                    group_quotas = dict.fromkeys(groups, int(row['DepartmentQuota']))
+                for column in awards.columns:
+                    group = str(column)[len('DepartmentQuota:'):]
+                    if str(column).startswith('DepartmentQuota:') and group in self.pool.group_pools and pd.notna(row[column]):
+                        group_quotas[group] = int(row[column])
+                if group_quotas:
+                    self.group_quotas[award] = group_quotas
+                quota = row.get('Quota')
+                self.quotas[award] = int(quota) if pd.notna(quota) else sum(group_quotas.values())
+            self.used = dict.fromkeys(self.quotas, 0)
+        if winners is not None:
+            for award, count in winners.dropna(subset=['Name'])['Award'].value_counts().items():
+                self.used[award] = self.used.get(award, 0) + int(count)
+            for award, name in zip(winners['Award'], winners['Name']):
+                self.count_groups(award, [name], 1)
+
+    @property
+    def total_awards(self):
+        return len(self.quotas)
+
+    @property
+    def total_participants(self):
+        return len(self.pool.roster)
+
+    @property
+    def winner_count(self):
+        return len(self.pool.win_counts)
+
+    @property
+    def not_win_count(self):
+        return len(self.pool)
+
+    def remaining(self, award):
+        remaining = self.quotas.get(award, 0) - self.used.get(award, 0)
+        if award in self.group_quotas:
+            remaining = min(remaining, sum(self.remaining_groups(award).values()))
+        return remaining
+
+    def remaining_groups(self, award):
+        # 分组奖项每个组的剩余名额
+        return {group: max(0, quota - self.group_used.get((award, group), 0))
+                for group, quota in self.group_quotas.get(award, {}).items()}
+
+    def count_groups(self, award, names, step):
+        if award not in self.group_quotas:
+            return
+        for name in names:
+            key = (award, self.pool.groups.get(name))
+            self.group_used[key] = self.group_used.get(key, 0) + step
+
+    def record_draw(self, award, names):
+        self.used[award] = self.used.get(award, 0) + len(names)
+        self.count_groups(award, names, 1)
+        self.pool.mark_won(names)
+
+    def record_revoke(self, award, names):
+        self.used[award] = self.used.get(award, 0) - len(names)
+        self.count_groups(award, names, -1)
+        self.pool.mark_revoked(names)
+
+    def reset(self):
+        self.used = dict.fromkeys(self.quotas, 0)
+        self.group_used = {}
+        self.pool.reset()
+
+
+class WinnersJournal:
+    # 中奖记录日志: 每次抽奖/撤销只追加一行JSON并fsync, 启动时回放, 需要时再合并写入winners.xlsx
+    # 合并时先把当前日志轮转为winners_journal.jsonl.<序号>, 新的中奖记录写入新日志, 后台写完winners.xlsx后再删除轮转的日志
+
+    def __init__(self, journal_path, winners_path):
+        self.journal_path = journal_path
+        self.winners_path = winners_path
+        self.compact_tmp_path = os.path.splitext(winners_path)[0] + '.tmp.xlsx'
+        self.pending = 0 # 尚未交给合并的事件数
+
+    def append(self, event, path=None):
+        with open(path or self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if path is None:
+            self.pending += 1
+
+    def append_draw(self, award, names):
+        self.append({'event': 'draw', 'award': award, 'names': list(names)})
+
+    def append_draws(self, draws):
+        # 批量抽奖的所有结果只写一行日志, 只fsync一次
+        if len(draws) == 1:
+            self.append_draw(*draws[0])
+        else:
+            self.append({'event': 'batch', 'draws': [[award, list(names)] for award, names in draws]})
+
+    def append_revoke(self, award, name):
+        self.append({'event': 'revoke', 'award': award, 'name': name})
+
+    @staticmethod
+    def read_events(path):
+        events = []
+        if not os.path.exists(path):
+            return events
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break # 最后一行可能因崩溃而写了一半
+        return events
+
+    def segments(self):
+        # 已轮转、尚未合并完成的日志, 按序号排列
+        folder = os.path.dirname(self.journal_path) or '.'
+        prefix = os.path.basename(self.journal_path) + '.'
+        numbers = sorted(int(file_name[len(prefix):]) for file_name in os.listdir(folder)
+                         if file_name.startswith(prefix) and file_name[len(prefix):].isdigit())
+        return [(number, f'{self.journal_path}.{number}') for number in numbers]
+
+    def rotate(self):
+        # 把当前日志轮转出来交给合并, 返回轮转后的序号
+        segments = self.segments()
+        number = segments[-1][0] + 1 if segments else 1
+        segment_path = f'{self.journal_path}.{number}'
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, segment_path)
+        else:
+            open(segment_path, 'a').close()
+        self.pending = 0
+        return number
+
+    def load(self):
+        # 日志最后一行是合并标记说明winners.xlsx已包含该日志及之前的所有日志, 临时文件已完整写入时补做替换
+        files = [path for _, path in self.segments()] + [self.journal_path]
+        file_events = [self.read_events(path) for path in files]
+        compacted = max((i for i, events in enumerate(file_events) if events and events[-1]['event'] == 'compact'), default=-1)
+        if compacted >= 0:
+            if os.path.exists(self.compact_tmp_path):
+                os.replace(self.compact_tmp_path, self.winners_path)
+            for path in files[:compacted + 1]:
+                if os.path.exists(path):
+                    os.remove(path)
+        elif os.path.exists(self.compact_tmp_path):
+            os.remove(self.compact_tmp_path)
+        events = [event for events in file_events[compacted + 1:] for event in events if event['event'] != 'compact']
+
+        rows = []
+        if os.path.exists(self.winners_path):
+            winners = read_excel_cached(self.winners_path)
+            rows = list(zip(winners['Award'], winners['Name']))
+        # 撤销时通过(奖项, 名字)索引找到行, 回放大量日志不需要每次扫描全部中奖者
+        positions = {}
+        for i, row in enumerate(rows):
+            positions.setdefault(row, []).append(i)
+        revoked = set()
+        def add(award, names):
+            for name in names:
+                positions.setdefault((award, name), []).append(len(rows))
+                rows.append((award, name))
+        for event in events:
+            if event['event'] == 'draw':
+                add(event['award'], event['names'])
+            elif event['event'] == 'batch':
+                for award, names in event['draws']:
+                    add(award, names)
+            elif event['event'] == 'revoke':
+                revoked.update(positions.pop((event['award'], event['name']), []))
+            elif event['event'] == 'reset':
+                revoked.update(range(len(rows)))
+                positions.clear()
+        if revoked:
+            rows = [row for i, row in enumerate(rows) if i not in revoked]
+        self.pending = len(events)
+        return pd.DataFrame(rows, columns=['Award', 'Name'])
+
+    def write_snapshot(self, winners, number):
+        # 可在后台线程执行: 先写临时文件, 在轮转日志中记录合并标记后再原子替换, 任何时刻崩溃都可以在load时恢复
+        winners = winners.reset_index(drop=True)
+        winners.to_excel(self.compact_tmp_path, index=False, engine='openpyxl')
+        self.append({'event': 'compact'}, f'{self.journal_path}.{number}')
+        os.replace(self.compact_tmp_path, self.winners_path)
+        # 崩溃恢复时直接读取二进制快照, 不需要解析刚写出的Excel
+        write_excel_cache(self.winners_path, winners)
+        for segment_number, path in self.segments():
+            if segment_number <= number:
+                os.remove(path)
+
+
+class AuditLog:
+    # 抽奖审计日志: 记录每次读取数据时的输入摘要和中奖名单, 每次抽奖的种子、计划和结果, 以及撤销/同步/重置
+    # verify_audit可以据此在无界面的引擎上重放整场抽奖, 逐次核对中奖者
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, event):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event, ensure_ascii=False, default=normalize_value) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def normalize_value(value):
+    # 统一Excel/数据库读取出的类型, 例如1和1.0、缺失值
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, (int, float)) or hasattr(value, 'item'):
+        value = value.item() if hasattr(value, 'item') else value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+    return str(value)
+
+
+def input_digest(participants, awards, reserves):
+    # 抽奖输入(参与者、奖项、内定名单)的摘要, 与存储方式无关, 审计时确认使用的是同一份数据
+    # 参与者只计算影响抽奖的列(数据库中不保存其他列), 统一类型后按列向量化计算哈希, 百万人也只需很短时间
+    digest = hashlib.sha1()
+    columns = {
+        'Name': lambda column: column.astype(str),
+        'Weight': lambda column: pd.to_numeric(column, errors='coerce').astype(float),
+        'Department': lambda column: column.where(column.notna(), '').astype(str)
+    }
+    for column, normalize in columns.items():
+        if column in participants.columns:
+            digest.update(column.encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(normalize(participants[column]), index=False).values.tobytes())
+    data = {
+        'awards': {str(column): [normalize_value(v) for v in awards[column]] for column in awards.columns},
+        'reserves': [[normalize_value(a), normalize_value(n)] for a, n in zip(reserves['Award'], reserves['Name'])]
+    }
+    digest.update(json.dumps(data, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class PersistenceWorker:
+    # 后台写文件线程: 同一个目标连续多次写入只保留最新的一次, Tk主线程不再等待Excel写入
+
+    def __init__(self):
+        self.jobs = {} # 目标 -> 写入函数
+        self.condition = threading.Condition()
+        self.busy = False
+        self.error = None # 最近一次写入失败的异常
+        self.thread = None
+
+    def submit(self, key, job):
+        with self.condition:
+            self.jobs[key] = job
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.jobs:
+                    self.condition.wait()
+                key = next(iter(self.jobs))
+                job = self.jobs.pop(key)
+                self.busy = True
+            try:
+                job()
+                self.error = None
+            except Exception as e:
+                self.error = e # 日志仍然完整, 下次合并或启动时会重试
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+    @property
+    def pending(self):
+        with self.condition:
+            return self.busy or bool(self.jobs)
+
+    def flush(self, timeout=None):
+        # 等待所有写入完成
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.jobs and not self.busy, timeout)
+
+
+def file_signature(file_path):
+    # 文件的修改时间和大小, 文件不存在时为空字符串
+    if not os.path.exists(file_path):
+        return ''
+    stat = os.stat(file_path)
+    return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+
+def write_excel_atomic(data, file_path):
+    # 先写临时文件再原子替换, 写入中途崩溃不会损坏原文件; 临时文件名区分进程和线程, 多个抽奖台可以同时导出
+    tmp_path = f'{os.path.splitext(file_path)[0]}.{os.getpid()}-{threading.get_ident()}.tmp.xlsx'
+    data.to_excel(tmp_path, index=False, engine='openpyxl')
+    os.replace(tmp_path, file_path)
+
+
+class ClaimConflict(ValueError):
+    # 共享模式下要写入的中奖者已被其他抽奖台抽走, 或奖项名额已用完
+    pass
+
+
+class SqliteStore:
+    # 可选的SQLite存储: 参与者、奖项、中奖者和内定名单保存在带索引的表中, 每次抽奖/撤销一个事务, WAL模式保证崩溃安全
+    # Excel文件变化时自动导入, 中奖名单在后台导出到winners.xlsx
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS participants (position INTEGER PRIMARY KEY, name TEXT NOT NULL, weight REAL, department TEXT);
+        CREATE INDEX IF NOT EXISTS participants_name ON participants (name);
+        CREATE INDEX IF NOT EXISTS participants_department ON participants (department);
+        CREATE TABLE IF NOT EXISTS awards (position INTEGER PRIMARY KEY, award TEXT NOT NULL, quota INTEGER);
+        CREATE INDEX IF NOT EXISTS awards_award ON awards (award);
+        CREATE TABLE IF NOT EXISTS department_quotas (award TEXT NOT NULL, department TEXT NOT NULL, quota INTEGER NOT NULL,
+                                                      PRIMARY KEY (award, department));
+        CREATE TABLE IF NOT EXISTS winners (id INTEGER PRIMARY KEY, award TEXT NOT NULL, name TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS winners_award ON winners (award);
+        CREATE INDEX IF NOT EXISTS winners_name ON winners (name);
+        CREATE TABLE IF NOT EXISTS reserves (position INTEGER PRIMARY KEY, award TEXT NOT NULL, name TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS reserves_award ON reserves (award);
+        CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY AUTOINCREMENT, action TEXT NOT NULL, winner_id INTEGER,
+                                           award TEXT, name TEXT, station TEXT);
+    '''
+
+    def __init__(self, db_path, shared=False):
+        self.db_path = db_path
+        # 共享模式下数据库可能放在共享文件夹中, WAL需要共享内存, 只能在本机使用, 所以改用回滚日志
+        self.shared = shared
+        # 数据可能在后台线程中读取, 之后只在Tk主线程中使用
+        self.connection = self.connect(db_path, shared)
+        self.connection.executescript(self.SCHEMA)
+
+    @staticmethod
+    def connect(db_path, shared=False):
+        connection = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        connection.execute('PRAGMA journal_mode=DELETE' if shared else 'PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=FULL')
+        return connection
+
+    def close(self):
+        self.connection.close()
+
+    def get_meta(self, key):
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value, connection=None):
+        (connection or self.connection).execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def source_changed(self, key, file_path):
+        return self.get_meta(f'{key}_source') != file_signature(file_path)
+
+    @staticmethod
+    def optional_column(data, column, convert):
+        if column not in data.columns:
+            return [None] * len(data)
+        return [None if pd.isna(value) else convert(value) for value in data[column]]
+
+    def import_participants(self, participants, file_path):
+        with self.connection:
+            self.connection.execute('DELETE FROM participants')
+            self.connection.executemany(
+                'INSERT INTO participants (position, name, weight, department) VALUES (?, ?, ?, ?)',
+                zip(range(len(participants)), participants['Name'],
+                    self.optional_column(participants, 'Weight', float),
+                    self.optional_column(participants, 'Department', str)))
+            self.set_meta('participants_columns', json.dumps([c for c in ('Name', 'Weight', 'Department') if c in participants.columns]))
+            self.set_meta('participants_source', file_signature(file_path))
+
+    def load_participants(self):
+        columns = json.loads(self.get_meta('participants_columns') or '["Name"]')
+        data = pd.read_sql_query('SELECT name AS Name, weight AS Weight, department AS Department FROM participants ORDER BY position',
+                                 self.connection)
+        return data[columns]
+
+    def import_awards(self, awards, file_path):
+        # 奖项表可能有DepartmentQuota等额外列, 完整内容保存在meta中, awards表用于查询
+        with self.connection:
+            self.connection.execute('DELETE FROM awards')
+            self.connection.executemany('INSERT INTO awards (position, award, quota) VALUES (?, ?, ?)',
+                                        zip(range(len(awards)), awards['Award'], self.optional_column(awards, 'Quota', int)))
+            self.set_meta('awards_data', awards.to_json(orient='split', force_ascii=False))
+            self.set_meta('awards_source', file_signature(file_path))
+
+    def load_awards(self):
+        return pd.read_json(StringIO(self.get_meta('awards_data')), orient='split')
+
+    def set_department_quotas(self, group_quotas):
+        # 分组奖项每个部门的名额(由AwardLedger按奖项表和参与者的部门算出), 共享模式抢占时在数据库中检查
+        rows = sorted((str(award), str(group), int(quota)) for award, quotas in group_quotas.items() for group, quota in quotas.items())
+        if self.connection.execute('SELECT award, department, quota FROM department_quotas ORDER BY award, department').fetchall() == rows:
+            return
+        with self.connection:
+            self.connection.execute('DELETE FROM department_quotas')
+            self.connection.executemany('INSERT INTO department_quotas (award, department, quota) VALUES (?, ?, ?)', rows)
+
+    def department_of(self, name):
+        # 同名多行时与ParticipantPool一致, 以最后一行为准
+        row = self.connection.execute('SELECT COALESCE(department, \'\') FROM participants WHERE name = ? ORDER BY position DESC LIMIT 1',
+                                      (name,)).fetchone()
+        return row[0] if row else None
+
+    def remaining_departments(self, award):
+        # 分组奖项各部门的剩余名额, 不分组的奖项返回{}
+        quotas = dict(self.connection.execute('SELECT department, quota FROM department_quotas WHERE award = ?', (award,)))
+        if not quotas:
+            return {}
+        for name, in self.connection.execute('SELECT name FROM winners WHERE award = ?', (award,)).fetchall():
+            department = self.department_of(name)
+            if department in quotas:
+                quotas[department] -= 1
+        return quotas
+
+    def import_reserves(self, reserves, file_path):
+        with self.connection:
+            self.connection.execute('DELETE FROM reserves')
+            self.connection.executemany('INSERT INTO reserves (position, award, name) VALUES (?, ?, ?)',
+                                        zip(range(len(reserves)), reserves['Award'], reserves['Name']))
+            self.set_meta('reserves_source', file_signature(file_path))
+
+    def load_reserves(self):
+        return pd.read_sql_query('SELECT award AS Award, name AS Name FROM reserves ORDER BY position', self.connection)
+
+    def import_winners(self, winners, file_path):
+        with self.connection:
+            self.connection.execute('DELETE FROM winners')
+            self.connection.executemany('INSERT INTO winners (id, award, name) VALUES (?, ?, ?)',
+                                        zip(map(int, winners.index), winners['Award'], winners['Name']))
+            self.set_meta('winners_source', file_signature(file_path))
+
+    def load_winners(self):
+        data = pd.read_sql_query('SELECT id, award AS Award, name AS Name FROM winners ORDER BY id', self.connection, index_col='id')
+        data.index.name = None
+        return data
+
+    def insert_winners(self, ids, awards, names, station):
+        rows = list(zip(ids, awards, names))
+        self.connection.executemany('INSERT INTO winners (id, award, name) VALUES (?, ?, ?)', rows)
+        self.connection.executemany("INSERT INTO events (action, winner_id, award, name, station) VALUES ('draw', ?, ?, ?, ?)",
+                                    [row + (station,) for row in rows])
+
+    def add_winners(self, ids, awards, names, station=''):
+        # 一次抽奖的所有中奖者在同一个事务中写入
+        with self.connection:
+            self.insert_winners(ids, awards, names, station)
+
+    def claim_winners(self, draws, from_all=False, station=''):
+        # 共享模式: 在数据库写锁内检查奖项剩余名额和是否已经中奖, 全部通过才写入, 返回新分配的行号
+        # 其他抽奖台同时抽奖时, 后提交的一方抛出ClaimConflict, 同步后重新抽取
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for award, names in draws:
+                # 奖项没有填写Quota时(只按部门分配名额)只检查各部门的名额
+                remaining = self.remaining(award)
+                if remaining is not None and remaining < len(names):
+                    raise ClaimConflict(f'{award}名额已被其他抽奖台抽完')
+                departments = self.remaining_departments(award)
+                for name in names:
+                    department = self.department_of(name)
+                    if department in departments:
+                        departments[department] -= 1
+                        if departments[department] < 0:
+                            raise ClaimConflict(f'{award}在{department}的名额已被其他抽奖台抽完')
+            names = [name for _, award_names in draws for name in award_names]
+            if not from_all:
+                taken = []
+                for start in range(0, len(names), 500):
+                    chunk = names[start:start + 500]
+                    taken += [row[0] for row in connection.execute(
+                        f'SELECT name FROM winners WHERE name IN ({",".join("?" * len(chunk))})', chunk)]
+                if taken:
+                    raise ClaimConflict(f'{", ".join(taken)}已被其他抽奖台抽中')
+            # 行号只增不减, 撤销后也不会复用
+            next_id = connection.execute('SELECT MAX(COALESCE((SELECT MAX(id) FROM winners), -1), '
+                                         'COALESCE((SELECT MAX(winner_id) FROM events), -1)) + 1').fetchone()[0]
+            ids = list(range(next_id, next_id + len(names)))
+            self.insert_winners(ids, [award for award, award_names in draws for _ in award_names], names, station)
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        return ids
+
+    def remove_winners(self, ids, station=''):
+        with self.connection:
+            for winner_id in ids:
+                self.connection.execute("INSERT INTO events (action, winner_id, award, name, station) "
+                                        "SELECT 'revoke', id, award, name, ? FROM winners WHERE id = ?", (station, int(winner_id)))
+                self.connection.execute('DELETE FROM winners WHERE id = ?', (int(winner_id),))
+
+    def clear_winners(self, station=''):
+        with self.connection:
+            self.connection.execute('DELETE FROM winners')
+            self.connection.execute("INSERT INTO events (action, station) VALUES ('reset', ?)", (station,))
+            # 不修改winners_source: 数据库是中奖名单的来源, 后台导出之前崩溃时旧的winners.xlsx不能被重新导入
+
+    def last_event(self):
+        return self.connection.execute('SELECT COALESCE(MAX(seq), 0) FROM events').fetchone()[0]
+
+    def events_since(self, seq):
+        # 返回[(序号, 动作, 行号, 奖项, 名字), ...]
+        return self.connection.execute('SELECT seq, action, winner_id, award, name FROM events WHERE seq > ? ORDER BY seq',
+                                       (seq,)).fetchall()
+
+    def remaining(self, award):
+        row = self.connection.execute(
+            'SELECT quota - (SELECT COUNT(*) FROM winners WHERE award = ?) FROM awards WHERE award = ?', (award, award)).fetchone()
+        return row[0] if row else 0
+
+    def eligible_count(self):
+        return self.connection.execute(
+            'SELECT COUNT(DISTINCT name) FROM participants WHERE name NOT IN (SELECT name FROM winners)').fetchone()[0]
+
+    def export_winners(self, winners, file_path):
+        # 可在后台线程执行, 使用单独的连接记录导出的文件版本, 下次启动时据此判断winners.xlsx是否被外部修改
+        # winners为None时从数据库读取最新的中奖名单(共享模式下包含其他抽奖台的结果)
+        connection = self.connect(self.db_path, self.shared)
+        try:
+            if winners is None:
+                winners = pd.read_sql_query('SELECT award AS Award, name AS Name FROM winners ORDER BY id', connection)
+            write_excel_atomic(winners, file_path)
+            with connection:
+                self.set_meta('winners_source', file_signature(file_path), connection)
+        finally:
+            connection.close()
+
+
+class LotteryEngine:
+    # 抽奖核心逻辑, 不依赖界面, 可以在没有显示器的环境下测试、压测和批量驱动
+
+    def __init__(self, data_folder='data'):
+        self.data_folder = data_folder
+        self.allow_reserve = False # 是否允许内定
+        self.participants = pd.DataFrame(columns=['Name']) # 所有抽奖参与者
+        self.awards = pd.DataFrame(columns=['Award', 'Quota']) # 奖项信息
+        self.winners = pd.DataFrame(columns=['Award', 'Name']) # 获奖者, 行号固定不变
+        self.winners_reserve = pd.DataFrame(columns=['Award', 'Name']) # 内定获奖者
+        self.reserves_by_award = {} # 奖项 -> 内定人员
+        self.reserve_names = set() # 所有内定人员
+        self.pool = ParticipantPool() # 尚未中奖参与者
+        self.ledger = AwardLedger(pool=self.pool) # 奖项配额台账
+        self.storage = 'excel' # 存储方式: excel(中奖日志+Excel), sqlite 或 shared(多个抽奖台共享数据库)
+        self.store = None # storage为sqlite或shared时的SqliteStore
+        self.station = f'{socket.gethostname()}-{os.getpid()}' # 本抽奖台的标识, 记录在数据库事件中
+        self.last_event_seq = 0 # 共享模式下已同步到的数据库事件序号
+        self.max_claim_retries = 5 # 共享模式下与其他抽奖台冲突时的重试次数
+        self.export_pending = False # sqlite模式下winners.xlsx是否需要重新导出
+        self.journal = None # 中奖记录日志
+        self.worker = PersistenceWorker() # 后台写入winners.xlsx
+        self.autosave = True # 每次抽奖/撤销后在后台更新winners.xlsx
+        self.next_winner_id = 0 # 下一个中奖者的行号
+        self.input_signatures = {} # 读取时输入文件的修改时间和大小, 用于判断是否需要重新读取
+        self.audit_log = None # 抽奖审计日志
+        self.seed_source = random.SystemRandom() # 每次读取数据时的种子来源
+        self.session_seed = None # 本次读取数据时生成的种子, 记录在审计日志的load事件中, 之后的抽奖都由它决定
+        self.draw_sequence = 0 # 下一次抽奖的序号, 每次抽取(包括被其他抽奖台抢先的)加1
+        self.session_started = None # 本引擎写入的会话标记的开始时间, 同一进程重新读取同一文件夹时区分新旧引擎的标记
+        self.recovery = None # 上次没有正常退出时的恢复情况: 中奖人数, 回放的日志条数, 耗时(秒)
+        self.listeners = [] # 中奖名单变化回调: callback(action, winner_ids), action为reload/draw/revoke
+
+    def path(self, file_name):
+        return os.path.join(self.data_folder, file_name)
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def notify(self, action, winner_ids):
+        for callback in self.listeners:
+            callback(action, winner_ids)
+
+    @staticmethod
+    def load_or_create_excel(file_path, data):
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if not os.path.exists(file_path):
+            pd.DataFrame(data).to_excel(file_path, index=False, engine='openpyxl')
+
+    def participants_path(self):
+        # 数据文件夹中有participants.csv时优先使用
+        csv_path = self.path('participants.csv')
+        return csv_path if os.path.exists(csv_path) else self.path('participants.xlsx')
+
+    def load(self, data_folder=None, allow_reserve=None, progress=None, storage=None):
+        # progress(已读行数, 总行数)在读取参与者名单时回调, 可以在后台线程中调用load
+        if data_folder is not None:
+            self.data_folder = data_folder
+        if allow_reserve is not None:
+            self.allow_reserve = allow_reserve
+        if storage is not None:
+            self.storage = storage
+        participants_path = self.participants_path()
+        awards_path = self.path('awards.xlsx')
+        winners_reserve_path = self.path('winners_reserve.xlsx')
+        # 等待后台写入完成再读取
+        self.worker.flush()
+        # 会话标记文件还在且不是本进程创建的, 说明上次没有正常退出(共享模式下由SQLite保证一致性, 不使用标记)
+        start = time.perf_counter()
+        crashed = self.storage != 'shared' and self.read_session() not in (None, os.getpid())
+
+        # 加载或创建Excel文件
+        self.load_or_create_excel(participants_path, {'Name': ['参与者1', '参与者2', '参与者3']})
+        self.load_or_create_excel(awards_path, {'Award': ['一等奖', '二等奖', '三等奖'], 'Quota': [1, 2, 3]})
+        if self.allow_reserve:
+            self.load_or_create_excel(winners_reserve_path, {'Award': [], 'Name': []})
+        elif os.path.exists(winners_reserve_path):
+            os.remove(winners_reserve_path)
+        # 在创建或删除内定名单之后记录, 否则刚读取完就会被认为输入有变化
+        self.input_signatures = self.read_input_signatures()
+        # 读取winners.xlsx并回放尚未合并的中奖日志
+        self.journal = WinnersJournal(self.path('winners_journal.jsonl'), self.path('winners.xlsx'))
+        if self.storage in ('sqlite', 'shared'):
+            self.load_sqlite(participants_path, awards_path, winners_reserve_path, progress)
+        else:
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+            self.awards = read_excel_cached(awards_path)
+            self.winners = self.journal.load()
+            self.participants = read_excel_cached(participants_path, lambda path: read_table_chunked(path, progress))
+            self.winners_reserve = read_excel_cached(winners_reserve_path) if self.allow_reserve else pd.DataFrame(columns=['Award', 'Name'])
+        self.next_winner_id = int(self.winners.index.max()) + 1 if len(self.winners) else 0
+        self.build_state()
+        if self.store is not None:
+            self.store.set_department_quotas(self.ledger.group_quotas)
+        if crashed:
+            replayed = self.journal.pending if self.journal is not None else 0
+            self.recovery = {'winners': len(self.winners), 'events': replayed, 'seconds': time.perf_counter() - start}
+            # 立即合并回放的日志, 再次崩溃时需要回放的更少
+            if replayed and self.autosave:
+                self.save(wait=False)
+        if self.storage != 'shared':
+            self.session_started = time.time()
+            with open(self.path('.session'), 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'started': self.session_started}, f)
+        # 共享模式下各抽奖台分别记录审计日志
+        audit_name = f'draw_audit_{self.station}.jsonl' if self.storage == 'shared' else 'draw_audit.jsonl'
+        # 上一次读取的种子先公开到原来的审计日志
+        self.reveal_seed()
+        self.audit_log = AuditLog(self.path(audit_name))
+        # 种子在任何抽奖之前生成, 摘要记录在load事件中, 抽奖结果由种子和序号决定, 无法通过反复抽取挑选结果
+        self.session_seed = self.seed_source.getrandbits(63)
+        self.draw_sequence = 0
+        self.audit_log.append({
+            'event': 'load', 'time': time.time(), 'storage': self.storage, 'allow_reserve': self.allow_reserve,
+            'seed_hash': seed_digest(self.session_seed),
+            'inputs': input_digest(self.participants, self.awards, self.winners_reserve),
+            'winners': [[award, name] for award, name in zip(self.winners['Award'], self.winners['Name'])]
+        })
+        self.notify('reload', list(self.winners.index))
+
+    def build_state(self):
+        # 根据参与者、奖项和中奖名单建立索引池和配额台账
+        # participants.xlsx中可选的Weight列为抽奖权重, 同名多行权重相加
+        weights = None
+        if 'Weight' in self.participants.columns:
+            weight_column = pd.to_numeric(self.participants['Weight'], errors='coerce').fillna(1).clip(lower=0)
+            weights = weight_column.groupby(self.participants['Name']).sum().to_dict()
+        # participants.xlsx中可选的Department列用于按部门分层抽奖
+        groups = None
+        if 'Department' in self.participants.columns:
+            groups = dict(zip(self.participants['Name'], self.participants['Department'].fillna('').astype(str)))
+        self.pool = ParticipantPool(self.participants['Name'].tolist(), self.winners['Name'].dropna().tolist(), weights, groups)
+        self.ledger = AwardLedger(self.awards, self.winners, self.pool)
+        # 内定名单按奖项分组, 每次抽奖不再过滤DataFrame
+        self.reserves_by_award = {}
+        for award, name in zip(self.winners_reserve['Award'], self.winners_reserve['Name']):
+            self.reserves_by_award.setdefault(award, []).append(name)
+        self.reserve_names = set(self.winners_reserve['Name'])
+
+    def audit(self, event):
+        if self.audit_log is not None:
+            self.audit_log.append(event)
+
+    def reveal_seed(self):
+        # 公开本次读取的种子, 之后不能再用它抽奖; 没有正常退出时种子不会公开, 这次读取之后的抽奖审计时无法核对
+        if self.session_seed is None:
+            return
+        self.audit({'event': 'reveal', 'time': time.time(), 'seed_hash': seed_digest(self.session_seed), 'seed': self.session_seed})
+        self.session_seed = None
+
+    def load_sqlite(self, participants_path, awards_path, winners_reserve_path, progress=None):
+        # Excel文件有变化时才导入数据库, 否则直接从数据库读取
+        shared = self.storage == 'shared'
+        if self.store is None or self.store.db_path != self.path('lottery.db') or self.store.shared != shared:
+            if self.store is not None:
+                self.store.close()
+            self.store = SqliteStore(self.path('lottery.db'), shared)
+        store = self.store
+        if store.source_changed('participants', participants_path):
+            store.import_participants(read_table_chunked(participants_path, progress), participants_path)
+        if store.source_changed('awards', awards_path):
+            store.import_awards(read_excel_cached(awards_path), awards_path)
+        if self.allow_reserve and store.source_changed('reserves', winners_reserve_path):
+            store.import_reserves(read_excel_cached(winners_reserve_path), winners_reserve_path)
+        # Excel模式下有新的中奖记录或winners.xlsx被修改过时, 重新导入中奖名单, 并把日志合并到winners.xlsx
+        # 共享模式下winners.xlsx由各抽奖台导出, 只在数据库第一次创建时导入
+        journal = self.journal
+        if shared:
+            changed = store.get_meta('winners_source') is None
+        else:
+            changed = journal.segments() or os.path.exists(journal.journal_path) or store.source_changed('winners', journal.winners_path)
+        if changed:
+            winners = journal.load()
+            if journal.pending or journal.segments():
+                journal.write_snapshot(winners, journal.rotate())
+            store.import_winners(winners, journal.winners_path)
+        self.journal = None
+        self.participants = store.load_participants()
+        self.awards = store.load_awards()
+        # 先记下事件序号再读取中奖名单, 之间其他抽奖台的写入在sync时重复应用也没有影响
+        self.last_event_seq = store.last_event()
+        self.winners = store.load_winners()
+        self.winners_reserve = store.load_reserves() if self.allow_reserve else pd.DataFrame(columns=['Award', 'Name'])
+
+    def read_input_signatures(self):
+        return {file_name: file_signature(self.path(file_name))
+                for file_name in ('participants.csv', 'participants.xlsx', 'awards.xlsx', 'winners_reserve.xlsx')}
+
+    def inputs_changed(self):
+        # 参与者、奖项或内定名单在读取之后是否被修改过
+        return self.read_input_signatures() != self.input_signatures
+
+    def read_session(self):
+        # 返回会话标记中的进程号, 没有标记时返回None
+        session_path = self.path('.session')
+        if not os.path.exists(session_path):
+            return None
+        try:
+            with open(session_path, encoding='utf-8') as f:
+                return json.load(f)['pid']
+        except (OSError, ValueError, KeyError, TypeError):
+            return -1
+
+    def close(self):
+        # 正常退出: 等待写入完成后删除会话标记, 下次启动时不会当作崩溃恢复
+        self.reveal_seed()
+        self.save(wait=True)
+        self.release_session()
+
+    def detach(self):
+        # 界面换用新读取的引擎后调用旧引擎的detach: 在后台线程保存, 然后删除本引擎的会话标记并关闭数据库连接, 不阻塞界面
+        self.reveal_seed()
+        self.save(wait=False)
+        def job():
+            self.release_session()
+            if self.store is not None:
+                self.store.close()
+        self.worker.submit(self.path('.session'), job)
+
+    def release_session(self):
+        # 只删除本引擎写入的标记, 同一文件夹重新读取后新引擎的标记保留
+        try:
+            with open(self.path('.session'), encoding='utf-8') as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return
+        if session.get('pid') == os.getpid() and session.get('started') == self.session_started:
+            os.remove(self.path('.session'))
+
+    def award_names(self):
+        return self.awards['Award'].unique().tolist()
+
+    def remaining(self, award):
+        return self.ledger.remaining(award)
+
+    def check(self, award, n):
+        # 返回错误信息, 没有错误时返回None
+        if award not in self.ledger.quotas:
+            return '请选择奖项!\n'
+        if self.ledger.remaining(award) < n:
+            return f'奖项({award})剩余配额不足！'
+        return None
+
+    def match_reserves(self, award, n, rng=random):
+        # 该奖项尚未中奖的内定人员, 最多n个
+        if not self.allow_reserve:
+            return []
+        match_reserves = [name for name in self.reserves_by_award.get(award, ()) if not self.pool.has_won(name)]
+        if len(match_reserves) > n:
+            return rng.sample(match_reserves, n)
+        return match_reserves
+
+    def allocate_groups(self, award, n, reserved, from_all=False, rng=random):
+        # 把分组奖项的n个名额分配到各组, 不超过各组剩余名额和可抽奖人数
+        remaining = self.ledger.remaining_groups(award)
+        for name in reserved:
+            group = self.pool.groups.get(name)
+            if remaining.get(group, 0) > 0:
+                remaining[group] -= 1
+        remaining = {group: min(count, self.pool.group_size(group, from_all)) for group, count in remaining.items()}
+        slots = n - len(reserved)
+        if slots >= sum(remaining.values()):
+            return remaining
+        # 名额不够分给所有组时按剩余名额随机分配
+        tickets = [group for group, count in remaining.items() for _ in range(count)]
+        plan = {}
+        for group in rng.sample(tickets, slots):
+            plan[group] = plan.get(group, 0) + 1
+        return plan
+
+    def pick_many(self, plan, from_all=False, rng=random):
+        # plan为[(奖项, 人数), ...], 所有不分组奖项的非内定人员通过一次抽样得到, 分组奖项按组分层抽样, 保证互不重复
+        reserves = [self.match_reserves(award, n, rng) for award, n in plan]
+        # 内定人员优先, 其余人员不抽取内定名单
+        exclude = set(self.reserve_names) if self.allow_reserve else set()
+        flat_count = sum(n - len(r) for (award, n), r in zip(plan, reserves) if award not in self.ledger.group_quotas)
+        others = self.pool.sample(flat_count, exclude=exclude, from_all=from_all, rng=rng)
+        exclude.update(others)
+        draws = []
+        start = 0
+        for (award, n), reserved in zip(plan, reserves):
+            if award in self.ledger.group_quotas:
+                group_plan = self.allocate_groups(award, n, reserved, from_all, rng)
+                group_names = self.pool.sample_groups(group_plan, exclude, from_all, rng)
+                names = [name for names in group_names.values() for name in names]
+                if len(names) + len(reserved) < n:
+                    raise ValueError(f'奖项({award})各部门可抽奖人数不足{n}人')
+                exclude.update(names)
+                draws.append((award, names + reserved))
+            else:
+                end = start + n - len(reserved)
+                draws.append((award, others[start:end] + reserved))
+                start = end
+        return draws
+
+    def pick(self, award, n, from_all=False, rng=random):
+        # 只抽取名字, 不记录中奖
+        return self.pick_many([(award, n)], from_all, rng)[0][1]
+
+    def commit_many(self, draws, from_all=False, sequence=None, plan=None):
+        # draws为[(奖项, 名字列表), ...], 一次写入DataFrame和中奖日志, 返回新分配的行号
+        # sequence和plan为抽取时的序号和计划, 记录在审计日志中; 没有序号(不是由draw_many抽取)的记录审计时视为不一致
+        event = {'event': 'draw', 'time': time.time(), 'sequence': sequence, 'plan': plan, 'from_all': from_all,
+                 'draws': [[award, list(names)] for award, names in draws]}
+        if self.storage == 'shared':
+            # 先在数据库中抢占, 成功后和其他抽奖台的记录一起同步到本地, 本地状态的变化记录在之后的同步事件中
+            new_ids = self.store.claim_winners(draws, from_all, self.station)
+            event['synced'] = True
+            self.audit(event)
+            self.export_pending = True
+            self.sync()
+            if self.autosave:
+                self.save(wait=False)
+            return new_ids
+        awards = [award for award, names in draws for _ in names]
+        names = [name for _, names in draws for name in names]
+        new_ids = range(self.next_winner_id, self.next_winner_id + len(names))
+        self.next_winner_id += len(names)
+        new_winners = pd.DataFrame({'Award': awards, 'Name': names}, index=new_ids)
+        self.winners = pd.concat([self.winners, new_winners]) if len(self.winners) else new_winners
+        for award, award_names in draws:
+            self.ledger.record_draw(award, award_names)
+        self.audit(event)
+        # 追加中奖日志或写入数据库, 不再整体重写winners.xlsx
+        if self.store is not None:
+            self.store.add_winners(list(new_ids), awards, names, self.station)
+            self.export_pending = True
+        else:
+            self.journal.append_draws(draws)
+        self.notify('draw', list(new_ids))
+        if self.autosave:
+            self.save(wait=False)
+        return list(new_ids)
+
+    def commit(self, award, names, from_all=False):
+        return self.commit_many([(award, names)], from_all)
+
+    def draw_many(self, plan, from_all=False):
+        # 抽取并记录, 共享模式下与其他抽奖台冲突时同步最新数据后重新抽取
+        # 第k次抽取使用读取数据时记录的种子在第k个计数器区间的随机数流, 审计时可以完全重现
+        plan = [(award, int(n)) for award, n in plan]
+        if self.session_seed is None:
+            raise ValueError('请先读取数据!')
+        for attempt in range(self.max_claim_retries):
+            sequence = self.draw_sequence
+            self.draw_sequence += 1
+            # 失败(人数不足)和被抢先的抽取也占用序号并记录, 保证序号连续; 审计时同样重放, 抽样的缓存状态与抽奖时一致
+            try:
+                draws = self.pick_many(plan, from_all, CounterRandom.for_draw(self.session_seed, sequence))
+            except ValueError:
+                self.audit({'event': 'failed', 'time': time.time(), 'sequence': sequence, 'plan': plan, 'from_all': from_all})
+                raise
+            try:
+                self.commit_many(draws, from_all, sequence, plan)
+                return draws
+            except ClaimConflict:
+                self.audit({'event': 'conflict', 'time': time.time(), 'sequence': sequence, 'plan': plan, 'from_all': from_all})
+                if attempt == self.max_claim_retries - 1:
+                    raise
+                self.sync()
+                for award, n in plan:
+                    message = self.check(award, n)
+                    if message:
+                        raise ValueError(message)
+
+    def draw(self, award, n, from_all=False):
+        message = self.check(award, n)
+        if message:
+            raise ValueError(message)
+        return self.draw_many([(award, n)], from_all)[0][1]
+
+    def draw_all(self, awards=None, from_all=False):
+        # 一次抽完指定奖项(默认所有奖项, 按顺序)的全部剩余配额, 返回[(奖项, 名字列表), ...]
+        self.sync()
+        awards = self.award_names() if awards is None else awards
+        plan = [(award, self.remaining(award)) for award in awards if self.remaining(award) > 0]
+        if not plan:
+            return []
+        return self.draw_many(plan, from_all)
+
+    def sync(self):
+        # 共享模式下把其他抽奖台(以及本机)新写入数据库的抽奖/撤销应用到本地, 返回是否有变化
+        if self.storage != 'shared' or self.store is None:
+            return False
+        events = self.store.events_since(self.last_event_seq)
+        if not events:
+            return False
+        self.last_event_seq = events[-1][0]
+        present = set(self.winners.index)
+        added = {} # 新增的行号 -> (奖项, 名字)
+        removed = set() # 需要删除的本地已有行号
+        for _, action, winner_id, award, name in events:
+            if action == 'reset':
+                removed.update(present - set(added))
+                added.clear()
+                present.clear()
+            elif action == 'draw':
+                # 本机抽奖时已经加载过的行不重复添加
+                if winner_id not in present:
+                    present.add(winner_id)
+                    added[winner_id] = (award, name)
+            elif winner_id in present:
+                present.discard(winner_id)
+                if winner_id in added:
+                    del added[winner_id]
+                else:
+                    removed.add(winner_id)
+        operations = [] # 对台账的修改, 记录在审计日志中
+        if removed:
+            to_revoke = self.winners.loc[sorted(removed)]
+            self.winners = self.winners.drop(to_revoke.index)
+            for award, rows in to_revoke.groupby('Award'):
+                self.ledger.record_revoke(award, rows['Name'].tolist())
+                operations.append(['revoke', award, rows['Name'].tolist()])
+        if added:
+            new_winners = pd.DataFrame([row for row in added.values()], columns=['Award', 'Name'], index=list(added))
+            self.winners = pd.concat([self.winners, new_winners]) if len(self.winners) else new_winners
+            for award, rows in new_winners.groupby('Award', sort=False):
+                self.ledger.record_draw(award, rows['Name'].tolist())
+                operations.append(['draw', award, rows['Name'].tolist()])
+        if operations:
+            self.audit({'event': 'sync', 'time': time.time(), 'operations': operations})
+        if removed:
+            self.notify('revoke', list(to_revoke.index))
+        if added:
+            self.notify('draw', list(added))
+        return bool(removed or added)
+
+    def revoke(self, award, name):
+        # 撤销匹配的中奖记录, 返回被删除的行号
+        to_revoke = self.winners[(self.winners['Award'] == award) & (self.winners['Name'] == name)]
+        if to_revoke.empty:
+            return []
+        self.winners = self.winners.drop(to_revoke.index)
+        self.ledger.record_revoke(award, to_revoke['Name'].tolist())
+        self.audit({'event': 'revoke', 'time': time.time(), 'award': award, 'names': to_revoke['Name'].tolist()})
+        if self.store is not None:
+            self.store.remove_winners(to_revoke.index, self.station)
+            self.export_pending = True
+        else:
+            self.journal.append_revoke(award, name)
+        self.notify('revoke', list(to_revoke.index))
+        if self.autosave:
+            self.save(wait=False)
+        return list(to_revoke.index)
+
+    def status(self):
+        ledger = self.ledger
+        return {
+            'total_awards': ledger.total_awards,
+            'total_participants': ledger.total_participants,
+            'winner_count': ledger.winner_count,
+            'not_win_count': ledger.not_win_count,
+            'awards': [(award, quota, ledger.remaining(award)) for award, quota in ledger.quotas.items()]
+        }
+
+    def save(self, wait=True):
+        # 把中奖日志合并保存到winners.xlsx(sqlite模式下为导出), wait为False时在后台线程写入
+        journal = self.journal
+        winners_path = self.path('winners.xlsx')
+        if self.store is not None:
+            if self.export_pending or not os.path.exists(winners_path):
+                # 共享模式下导出时从数据库读取, 包含其他抽奖台的结果
+                winners = None if self.storage == 'shared' else self.winners
+                store = self.store
+                self.export_pending = False
+                self.worker.submit(winners_path, lambda: store.export_winners(winners, winners_path))
+            journal = None
+        if journal is None:
+            if wait:
+                self.worker.flush()
+                if self.worker.error is not None:
+                    raise self.worker.error
+            return
+        # 之前写入失败留下的轮转日志也需要重新合并
+        retry = not self.worker.pending and journal.segments()
+        if journal.pending or retry or not os.path.exists(journal.winners_path):
+            # winners不会被原地修改, 直接把当前对象交给后台线程
+            winners = self.winners
+            number = journal.rotate()
+            self.worker.submit(journal.winners_path, lambda: journal.write_snapshot(winners, number))
+        if wait:
+            self.worker.flush()
+            if self.worker.error is not None:
+                raise self.worker.error
+
+    @property
+    def unsaved(self):
+        # winners.xlsx是否落后于中奖日志
+        return self.worker.pending or self.export_pending or (self.journal is not None and self.journal.pending > 0)
+
+    def reset(self):
+        # 在内存中清空中奖名单和配额台账, 不重新读取参与者和奖项; 原中奖名单在后台保存为winners_old.xlsx, winners.xlsx清空
+        old_winners = self.winners
+        empty = pd.DataFrame(columns=['Award', 'Name'])
+        winners_path = self.path('winners.xlsx')
+        old_winners_path = self.path('winners_old.xlsx')
+        if self.store is not None:
+            store = self.store
+            store.clear_winners(self.station)
+            export = None if self.storage == 'shared' else empty
+            self.export_pending = False
+            job = lambda: store.export_winners(export, winners_path)
+        else:
+            # 先把重置记录写入日志, 之后任何时刻崩溃都能恢复为空的中奖名单, 再在后台合并
+            journal = self.journal
+            journal.rotate()
+            journal.append({'event': 'reset'})
+            number = journal.rotate()
+            job = lambda: journal.write_snapshot(empty, number)
+        # 备份和清空分开提交: 之后的抽奖会替换尚未执行的winners.xlsx写入, 但不能替换备份
+        self.worker.submit(old_winners_path, lambda: write_excel_atomic(old_winners, old_winners_path))
+        self.worker.submit(winners_path, job)
+        self.winners = empty
+        self.ledger.reset()
+        self.audit({'event': 'reset', 'time': time.time()})
+        self.notify('reload', [])
+
+
+def verify_audit(data_folder, audit_path=None):
+    # 在无界面的引擎上重放审计日志: 每次读取数据时核对输入摘要并按当时的中奖名单重建状态
+    # 每次抽奖的序号必须从0开始连续, 用读取时记录的种子和序号重新抽取并核对; 跳过的序号说明有抽取结果没有被记录
+    # 返回(是否全部一致, 核对的抽奖次数, 报告)
+    engine = LotteryEngine(data_folder)
+    events = WinnersJournal.read_events(audit_path or engine.path('draw_audit.jsonl'))
+    # 种子在关闭或下一次读取时才公开, 先收集所有公开的种子: 摘要 -> 种子
+    seeds = {event['seed_hash']: event['seed'] for event in events
+             if event['event'] == 'reveal' and seed_digest(event['seed']) == event['seed_hash']}
+    inputs = None
+    digests = {} # 是否允许内定 -> 当前输入的摘要
+    loaded = False
+    seed = None # 本次读取数据时的种子(由之后公开的种子按摘要找到)
+    expected = 0 # 下一次抽奖应有的序号
+    checked = 0
+    report = []
+    for number, event in enumerate(events, 1):
+        kind = event['event']
+        if kind == 'load':
+            if inputs is None:
+                participants = read_excel_cached(engine.participants_path(), read_table_chunked)
+                awards = read_excel_cached(engine.path('awards.xlsx'))
+                reserves_path = engine.path('winners_reserve.xlsx')
+                reserves = read_excel_cached(reserves_path) if os.path.exists(reserves_path) else pd.DataFrame(columns=['Award', 'Name'])
+                inputs = (participants, awards, reserves)
+            participants, awards, reserves = inputs
+            engine.allow_reserve = event['allow_reserve']
+            seed = seeds.get(event.get('seed_hash'))
+            expected = 0
+            if seed is None:
+                loaded = False
+                report.append(f'第{number}条记录: 本次读取的种子没有公开(可能没有正常退出), 到下一次读取数据之前的抽奖无法核对')
+                continue
+            reserves = reserves if engine.allow_reserve else pd.DataFrame(columns=['Award', 'Name'])
+            if engine.allow_reserve not in digests:
+                digests[engine.allow_reserve] = input_digest(participants, awards, reserves)
+            loaded = digests[engine.allow_reserve] == event['inputs']
+            if not loaded:
+                report.append(f'第{number}条记录: 当前的参与者/奖项/内定名单与抽奖时不一致, 到下一次读取数据之前的抽奖无法核对')
+                continue
+            engine.participants, engine.awards, engine.winners_reserve = participants, awards, reserves
+            engine.winners = pd.DataFrame(event['winners'], columns=['Award', 'Name'])
+            engine.build_state()
+        elif not loaded:
+            continue
+        elif kind in ('draw', 'conflict', 'failed'):
+            sequence = event.get('sequence')
+            if sequence != expected:
+                report.append(f'第{number}条记录: 抽奖序号{sequence}不是预期的{expected}, 中间的抽取结果没有记录或不是按记录的种子抽取')
+            expected = (sequence if isinstance(sequence, int) else expected) + 1
+            if not isinstance(sequence, int):
+                continue
+            plan = [(award, n) for award, n in event['plan']]
+            rng = CounterRandom.for_draw(seed, sequence)
+            if kind == 'failed':
+                # 抽奖时人数不足而失败, 重放也应当失败
+                checked += 1
+                try:
+                    replayed = engine.pick_many(plan, event['from_all'], rng)
+                except ValueError:
+                    continue
+                report.append(f'第{number}条记录: 记录为抽取失败, 重放却抽中了{replayed}')
+                continue
+            if kind == 'conflict':
+                # 被其他抽奖台抢先的抽取不改变中奖名单, 只重放抽样
+                try:
+                    engine.pick_many(plan, event['from_all'], rng)
+                except ValueError:
+                    report.append(f'第{number}条记录: 记录为被抢先的抽取重放时失败')
+                continue
+            draws = [(award, names) for award, names in event['draws']]
+            checked += 1
+            try:
+                replayed = engine.pick_many(plan, event['from_all'], rng)
+                consistent = [[normalize_value(award), [normalize_value(name) for name in names]] for award, names in replayed] == event['draws']
+            except ValueError as e:
+                replayed, consistent = str(e), False
+            if not consistent:
+                report.append(f'第{number}条记录: 重放结果{replayed}与记录的中奖者{draws}不一致')
+            if not event.get('synced'):
+                for award, names in draws:
+                    engine.ledger.record_draw(award, names)
+        elif kind == 'revoke':
+            engine.ledger.record_revoke(event['award'], event['names'])
+        elif kind == 'sync':
+            for operation, award, names in event['operations']:
+                if operation == 'draw':
+                    engine.ledger.record_draw(award, names)
+                else:
+                    engine.ledger.record_revoke(award, names)
+        elif kind == 'reset':
+            engine.ledger.reset()
+    return not report, checked, report
@@ -0,0 +1,389 @@
+import json
+import os
+import sys
+import random
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lottery_engine import ClaimConflict, LotteryEngine, ParticipantPool, verify_audit
+
+
+# 无界面引擎的测试: python -m pytest -q tests
+
+
+def make_folder(folder, participants, awards):
+    # participants/awards为DataFrame的参数字典
+    pd.DataFrame(participants).to_excel(os.path.join(folder, 'participants.xlsx'), index=False)
+    pd.DataFrame(awards).to_excel(os.path.join(folder, 'awards.xlsx'), index=False)
+    return str(folder)
+
+
+def open_engine(folder, storage='excel', station=None, allow_reserve=False):
+    engine = LotteryEngine()
+    if station is not None:
+        engine.station = station
+    engine.load(folder, allow_reserve, storage=storage)
+    return engine
+
+
+def people(count, departments=None):
+    data = {'Name': [f'p{i}' for i in range(count)], 'Weight': [1 + i % 3 for i in range(count)]}
+    if departments:
+        data['Department'] = [departments[i % len(departments)] for i in range(count)]
+    return data
+
+
+def winner_pairs(engine):
+    return sorted(zip(engine.winners['Award'], engine.winners['Name']))
+
+
+def weighted_pool(count, weight=1.0):
+    names = [f'p{i}' for i in range(count)]
+    return names, ParticipantPool(names, (), {name: weight for name in names})
+
+
+def pick_counts(pool, names, rounds, rng):
+    # 抽取rounds次, 每次1人, 返回names中的人被抽中的次数
+    names = set(names)
+    return sum(1 for _ in range(rounds) for name in pool.sample(1, rng=rng) if name in names)
+
+
+def test_sample_is_uniform_and_unique():
+    rng = random.Random(0)
+    names = [f'p{i}' for i in range(10)]
+    pool = ParticipantPool(names)
+    counts = dict.fromkeys(names, 0)
+    for _ in range(5000):
+        selected = pool.sample(3, exclude={'p0'}, rng=rng)
+        assert len(set(selected)) == 3 and 'p0' not in selected
+        for name in selected:
+            counts[name] += 1
+    assert counts['p0'] == 0
+    for name in names[1:]:
+        assert counts[name] == pytest.approx(5000 * 3 / 9, rel=0.1)
+
+
+def test_weighted_sample_follows_weights():
+    rng = random.Random(5)
+    pool = ParticipantPool(['a', 'b', 'c'], (), {'a': 1.0, 'b': 2.0, 'c': 7.0})
+    counts = {'a': 0, 'b': 0, 'c': 0}
+    for _ in range(20000):
+        counts[pool.sample(1, rng=rng)[0]] += 1
+    assert counts['a'] == pytest.approx(2000, rel=0.1)
+    assert counts['b'] == pytest.approx(4000, rel=0.1)
+    assert counts['c'] == pytest.approx(14000, rel=0.05)
+
+
+def test_pool_revoke_and_reset():
+    pool = ParticipantPool(['a', 'b', 'c', 'd'], ['a'])
+    assert len(pool) == 3 and 'a' not in pool
+    pool.mark_won(['b', 'b'])
+    pool.mark_revoked(['b'])
+    assert 'b' not in pool # 中奖两次只撤销一次, 仍然算已中奖
+    pool.mark_revoked(['b', 'a'])
+    assert 'a' in pool and 'b' in pool
+    pool.mark_won(['c', 'd'])
+    pool.reset()
+    assert sorted(pool.names) == ['a', 'b', 'c', 'd'] and not pool.win_counts
+
+
+def test_weighted_sample_includes_revoked_names():
+    rng = random.Random(1)
+    names, pool = weighted_pool(100)
+    won = pool.sample(60, rng=rng)
+    pool.mark_won(won)
+    pool.sample(5, rng=rng) # 有效权重不足一半, 别名表只包含剩余40人
+    pool.mark_revoked(won[:10])
+    # 50人中撤销的10人约占1/5
+    assert pick_counts(pool, won[:10], 20000, rng) == pytest.approx(4000, rel=0.1)
+
+
+def test_weighted_revoke_keeps_alias_table():
+    rng = random.Random(6)
+    names, pool = weighted_pool(100)
+    pool.sample(1, rng=rng)
+    table = pool.alias_table
+    won = names[:10]
+    pool.mark_won(won)
+    pool.sample(1, rng=rng)
+    pool.mark_revoked(won)
+    # 撤销的人员仍在主表中, 不放入附加表, 否则会被重复计算权重
+    assert not pool.extra_names
+    assert pick_counts(pool, won, 20000, rng) == pytest.approx(2000, rel=0.1)
+    assert pool.alias_table is table
+
+
+def test_weighted_sample_after_reset():
+    rng = random.Random(2)
+    names, pool = weighted_pool(100)
+    won = pool.sample(60, rng=rng)
+    pool.mark_won(won)
+    pool.sample(5, rng=rng)
+    pool.reset()
+    assert len(pool) == 100
+    assert pick_counts(pool, won, 20000, rng) == pytest.approx(12000, rel=0.05)
+
+
+def test_weighted_group_pool_after_revoke():
+    rng = random.Random(3)
+    names = [f'p{i}' for i in range(100)]
+    pool = ParticipantPool(names, (), {name: 1.0 for name in names}, {name: 'A' for name in names})
+    won = pool.sample_groups({'A': 60}, rng=rng)['A']
+    pool.mark_won(won)
+    pool.sample_groups({'A': 5}, rng=rng)
+    pool.mark_revoked(won[:10])
+    hits = sum(1 for _ in range(20000) for name in pool.sample_groups({'A': 1}, rng=rng)['A'] if name in won[:10])
+    assert hits == pytest.approx(4000, rel=0.1)
+
+
+def test_weighted_sample_skips_zero_weight():
+    names = [f'p{i}' for i in range(30)]
+    weights = {name: (0.0 if i % 2 else 1.0) for i, name in enumerate(names)}
+    pool = ParticipantPool(names, (), weights)
+    selected = pool.sample(15, rng=random.Random(4))
+    assert all(weights[name] > 0 for name in selected)
+    with pytest.raises(ValueError):
+        pool.sample(16, rng=random.Random(4))
+
+
+def test_shared_claims_respect_department_quotas(tmp_path):
+    folder = make_folder(tmp_path, {'Name': [f'p{i}' for i in range(20)], 'Department': ['A', 'B'] * 10},
+                         {'Award': ['X'], 'DepartmentQuota': [2]})
+    first = open_engine(folder, 'shared', 's1')
+    second = open_engine(folder, 'shared', 's2')
+    try:
+        first.draw('X', 4)
+        # second还没有同步first的结果, 抢占时由数据库检查各部门名额(全体参与时不检查是否已中奖)
+        with pytest.raises(ValueError):
+            second.draw('X', 4, from_all=True)
+        assert len(first.store.load_winners()) == 4
+        second.sync()
+        assert second.remaining('X') == 0
+    finally:
+        first.close()
+        second.close()
+
+
+@pytest.mark.parametrize('allow_reserve', [True, False])
+def test_inputs_unchanged_after_load(tmp_path, allow_reserve):
+    folder = make_folder(tmp_path, {'Name': ['a', 'b', 'c']}, {'Award': ['X'], 'Quota': [1]})
+    engine = open_engine(folder, allow_reserve=allow_reserve)
+    try:
+        assert not engine.inputs_changed()
+        pd.DataFrame({'Name': ['a', 'b', 'c', 'd']}).to_excel(os.path.join(folder, 'participants.xlsx'), index=False)
+        assert engine.inputs_changed()
+    finally:
+        engine.close()
+
+
+def test_journal_replay_after_crash(tmp_path):
+    folder = make_folder(tmp_path, people(50), {'Award': ['X', 'Y'], 'Quota': [10, 10]})
+    engine = open_engine(folder)
+    engine.autosave = False
+    engine.draw('X', 4)
+    engine.draw_all(['Y'])
+    revoked = engine.winners.iloc[0]
+    engine.revoke(revoked['Award'], revoked['Name'])
+    expected = winner_pairs(engine)
+    # 模拟崩溃: 没有合并中奖日志, 会话标记属于另一个已经退出的进程
+    with open(os.path.join(folder, '.session'), 'w', encoding='utf-8') as f:
+        json.dump({'pid': -1}, f)
+    recovered = open_engine(folder)
+    try:
+        assert winner_pairs(recovered) == expected
+        assert recovered.recovery['winners'] == 13 and recovered.recovery['events'] == 3
+        assert recovered.remaining('X') == 7 and recovered.remaining('Y') == 0
+    finally:
+        recovered.close()
+    assert not os.path.exists(os.path.join(folder, '.session'))
+    assert winner_pairs(open_engine(folder)) == expected
+
+
+@pytest.mark.parametrize('storage', ['excel', 'sqlite'])
+def test_detach_releases_only_own_session(tmp_path, storage):
+    (tmp_path / 'old').mkdir()
+    (tmp_path / 'new').mkdir()
+    old_folder = make_folder(tmp_path / 'old', people(10), {'Award': ['X'], 'Quota': [2]})
+    new_folder = make_folder(tmp_path / 'new', people(10), {'Award': ['X'], 'Quota': [2]})
+    old = open_engine(old_folder, storage)
+    old.draw('X', 1)
+    # 同一文件夹重新读取: 旧引擎不能删除新引擎的会话标记
+    same = open_engine(old_folder, storage)
+    old.detach()
+    old.worker.flush()
+    assert os.path.exists(os.path.join(old_folder, '.session'))
+    # 换到其他文件夹: 旧文件夹的标记被删除, 下次打开不会当作崩溃恢复
+    new = open_engine(new_folder, storage)
+    same.detach()
+    same.worker.flush()
+    assert not os.path.exists(os.path.join(old_folder, '.session'))
+    if storage == 'sqlite':
+        with pytest.raises(Exception):
+            same.store.connection.execute('SELECT 1')
+    reopened = open_engine(old_folder, storage)
+    assert reopened.recovery is None and len(reopened.winners) == 1
+    reopened.close()
+    new.close()
+
+
+@pytest.mark.parametrize('storage', ['excel', 'sqlite'])
+def test_reset_keeps_inputs_and_backs_up_winners(tmp_path, storage):
+    folder = make_folder(tmp_path, people(30), {'Award': ['X'], 'Quota': [5]})
+    engine = open_engine(folder, storage)
+    engine.draw('X', 5)
+    old = winner_pairs(engine)
+    engine.reset()
+    assert engine.remaining('X') == 5 and len(engine.pool) == 30
+    engine.close()
+    backup = pd.read_excel(os.path.join(folder, 'winners_old.xlsx'))
+    assert sorted(zip(backup['Award'], backup['Name'])) == old
+    assert len(open_engine(folder, storage).winners) == 0
+
+
+@pytest.mark.parametrize('storage', ['excel', 'sqlite'])
+def test_reset_survives_crash_before_export(tmp_path, storage):
+    folder = make_folder(tmp_path, people(30), {'Award': ['X'], 'Quota': [5]})
+    engine = open_engine(folder, storage)
+    engine.draw('X', 5)
+    engine.worker.flush()
+    # 模拟后台写入之前崩溃: 重置后提交的备份和导出都不执行
+    engine.worker.submit = lambda key, job: None
+    engine.reset()
+    with open(os.path.join(folder, '.session'), 'w', encoding='utf-8') as f:
+        json.dump({'pid': -1}, f)
+    recovered = open_engine(folder, storage)
+    try:
+        assert len(recovered.winners) == 0 and recovered.remaining('X') == 5
+    finally:
+        recovered.close()
+
+
+def test_shared_claim_conflicts(tmp_path):
+    folder = make_folder(tmp_path, people(40), {'Award': ['X'], 'Quota': [30]})
+    first = open_engine(folder, 'shared', 's1')
+    second = open_engine(folder, 'shared', 's2')
+    try:
+        names = first.draw('X', 3)
+        # 同一人不能被两个抽奖台抽中, 冲突的抢占不写入任何记录
+        with pytest.raises(ClaimConflict):
+            second.store.claim_winners([('X', [names[0], first.pool.names[0]])], station='s2')
+        assert len(first.store.load_winners()) == 3
+        # 两个抽奖台交替抽奖且不主动同步, 冲突时自动同步后重抽
+        for i in range(12):
+            (first if i % 2 else second).draw('X', 2)
+        winners = first.store.load_winners()
+        assert len(winners) == 27 and winners['Name'].is_unique
+        first.sync()
+        second.sync()
+        assert winner_pairs(first) == winner_pairs(second)
+        assert first.remaining('X') == second.remaining('X') == 3
+    finally:
+        first.close()
+        second.close()
+
+
+@pytest.mark.parametrize('storage', ['excel', 'sqlite'])
+def test_verify_audit_round_trip(tmp_path, storage):
+    folder = make_folder(tmp_path, people(60, ['A', 'B']), {'Award': ['X', 'Y'], 'Quota': [8, None], 'DepartmentQuota': [None, 3]})
+    engine = open_engine(folder, storage)
+    engine.draw('X', 3)
+    engine.draw('Y', 4, from_all=True)
+    engine.revoke('X', engine.winners.iloc[0]['Name'])
+    engine.reset()
+    engine.draw('X', 5)
+    engine.close()
+    engine = open_engine(folder, storage) # 重新读取后使用新的种子
+    engine.draw_all()
+    engine.close()
+    ok, checked, report = verify_audit(folder)
+    assert ok, report
+    assert checked == 4 # draw_all的所有奖项是一次抽取
+
+
+def tamper_audit(folder, change):
+    # change(记录列表)修改审计日志中的记录
+    path = os.path.join(folder, 'draw_audit.jsonl')
+    with open(path, encoding='utf-8') as f:
+        events = [json.loads(line) for line in f]
+    change(events)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(event, ensure_ascii=False) + '\n' for event in events)
+
+
+def test_verify_audit_detects_tampering(tmp_path):
+    folder = make_folder(tmp_path, people(60), {'Award': ['X'], 'Quota': [20]})
+    engine = open_engine(folder)
+    for _ in range(4):
+        engine.draw('X', 2)
+    engine.close()
+    assert verify_audit(folder)[0]
+
+    def replace_winner(events):
+        draw = [event for event in events if event['event'] == 'draw'][1]
+        draw['draws'][0][1][0] = next(f'p{i}' for i in range(60) if f'p{i}' not in draw['draws'][0][1])
+    tamper_audit(folder, replace_winner)
+    ok, checked, report = verify_audit(folder)
+    assert not ok and '不一致' in report[0]
+
+    # 隐藏一次抽取结果(例如不满意后重抽)会使序号不连续
+    def drop_draw(events):
+        events.remove([event for event in events if event['event'] == 'draw'][1])
+    tamper_audit(folder, drop_draw)
+    ok, checked, report = verify_audit(folder)
+    assert not ok and any('序号' in line for line in report)
+
+
+def test_verify_audit_after_failed_draw(tmp_path):
+    folder = make_folder(tmp_path, people(3), {'Award': ['X'], 'Quota': [10]})
+    engine = open_engine(folder)
+    engine.draw('X', 2)
+    with pytest.raises(ValueError):
+        engine.draw('X', 2) # 只剩1人, 抽取失败也占用序号
+    engine.draw('X', 1)
+    engine.close()
+    ok, checked, report = verify_audit(folder)
+    assert ok, report
+    assert checked == 3
+
+
+def test_seed_is_revealed_only_after_close(tmp_path):
+    folder = make_folder(tmp_path, people(20), {'Award': ['X'], 'Quota': [5]})
+    engine = open_engine(folder)
+    engine.draw('X', 2)
+    with open(os.path.join(folder, 'draw_audit.jsonl'), encoding='utf-8') as f:
+        events = [json.loads(line) for line in f]
+    # 抽奖期间日志中只有种子的摘要
+    assert 'seed' not in events[0] and all(event['event'] != 'reveal' for event in events)
+    ok, checked, report = verify_audit(folder)
+    assert not ok and '没有公开' in report[0]
+    engine.close()
+    assert verify_audit(folder)[0]
+
+    # 伪造的种子与摘要不符, 不会被使用
+    def forge_seed(events):
+        reveal = [event for event in events if event['event'] == 'reveal'][0]
+        reveal['seed'] += 1
+    tamper_audit(folder, forge_seed)
+    assert not verify_audit(folder)[0]
+
+
+def test_verify_shared_audit_with_conflicts_and_revokes(tmp_path):
+    folder = make_folder(tmp_path, people(40, ['A', 'B']), {'Award': ['X', 'Y'], 'Quota': [20, None], 'DepartmentQuota': [None, 4]})
+    first = open_engine(folder, 'shared', 's1')
+    second = open_engine(folder, 'shared', 's2')
+    for i in range(10):
+        engine = first if i % 2 else second
+        engine.draw('X', 2)
+        if i % 3 == 0:
+            winner = engine.winners.iloc[0]
+            engine.revoke(winner['Award'], winner['Name'])
+    first.sync()
+    second.sync()
+    first.draw('Y', 4)
+    second.draw('Y', 2, from_all=True)
+    first.close()
+    second.close()
+    for station in ('s1', 's2'):
+        ok, checked, report = verify_audit(folder, os.path.join(folder, f'draw_audit_{station}.jsonl'))
+        assert ok, report
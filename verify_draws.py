@@ -0,0 +1,27 @@
+import argparse
+import sys
+import time
+from lottery_engine import verify_audit
+
+
+# 抽奖审计: 用审计日志中记录的种子在无界面的引擎上重放整场抽奖, 逐次核对中奖者
+# 用法: python verify_draws.py --data data [--audit data/draw_audit.jsonl]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='核对抽奖审计日志')
+    parser.add_argument('--data', default='data', help='数据文件夹(参与者和奖项文件须与抽奖时一致)')
+    parser.add_argument('--audit', default=None, help='审计日志路径, 默认<数据文件夹>/draw_audit.jsonl')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ok, checked, report = verify_audit(args.data, args.audit)
+    elapsed = time.perf_counter() - start
+    for line in report:
+        print(line)
+    print(f"{'全部一致' if ok else '发现不一致'}: 共核对{checked}次抽奖, 用时{elapsed * 1000:.0f}ms")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
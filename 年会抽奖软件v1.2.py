@@ -1,13 +1,89 @@
+import time
+STARTUP_TIME = time.perf_counter() # 启动计时起点
 from pathlib import Path
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 import tkinter as tk
 from tkinter import messagebox
 import json
-import pandas as pd
 import os
-from PIL import Image, ImageTk
 import random
+import threading
+from collections import OrderedDict, deque
+from instrumentation import HandlerTimer, DrawProfiler, LagMonitor
+# pandas, openpyxl和PIL导入很慢, 在后台线程预加载, 用到时再导入
+
+
+def preload_modules():
+    import pandas
+    import openpyxl
+    from PIL import Image, ImageTk
+    import lottery_engine
+
+
+class FrameScheduler:
+    # 按固定帧间隔调用callback: 用monotonic时间计算每帧的目标时刻, 补偿after()的漂移, 落后时跳帧而不是堆积
+
+    def __init__(self, widget, interval, callback):
+        self.widget = widget
+        self.interval = interval # 帧间隔(ms)
+        self.callback = callback
+        self.job = None
+        self.reset_stats()
+
+    def set_interval(self, interval):
+        # 运行中修改帧间隔时以当前帧为新的起点, 避免按新间隔重新计算时误判为落后而跳帧
+        self.interval = interval
+        if self.job is not None:
+            self.start_time = time.monotonic() - self.frame * interval / 1000
+
+    def reset_stats(self):
+        self.frame_times = [] # 相邻两帧的实际间隔(ms)
+        self.dropped_frames = 0
+
+    def start(self):
+        self.stop()
+        self.reset_stats()
+        self.frame = 0
+        self.start_time = time.monotonic()
+        self.last_time = None
+        self.job = self.widget.after(0, self.tick)
+
+    def stop(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+    def tick(self):
+        now = time.monotonic()
+        if self.last_time is not None:
+            self.frame_times.append((now - self.last_time) * 1000)
+        self.last_time = now
+        self.callback()
+        if self.job is None:
+            return # callback中已经停止
+        # 下一帧的目标时刻, 已经错过的帧直接跳过
+        interval = self.interval / 1000
+        self.frame += 1
+        now = time.monotonic()
+        late_frames = int((now - self.start_time) / interval) - self.frame + 1
+        if late_frames > 0:
+            self.dropped_frames += late_frames
+            self.frame += late_frames
+        delay = self.start_time + self.frame * interval - now
+        self.job = self.widget.after(max(0, round(delay * 1000)), self.tick)
+
+    def stats(self):
+        frame_times = sorted(self.frame_times)
+        if not frame_times:
+            return {'frames': 0, 'mean_ms': 0, 'p99_ms': 0, 'max_ms': 0, 'dropped_frames': self.dropped_frames}
+        return {
+            'frames': len(frame_times) + 1,
+            'mean_ms': sum(frame_times) / len(frame_times),
+            'p99_ms': frame_times[min(len(frame_times) - 1, int(len(frame_times) * 0.99))],
+            'max_ms': frame_times[-1],
+            'dropped_frames': self.dropped_frames
+        }
 
 
 class LotteryApp(ttk.Frame):
@@ -15,13 +91,20 @@ class LotteryApp(ttk.Frame):
     def __init__(self, master, **kwargs):
         super().__init__(master, **kwargs)
         self.pack(fill=BOTH, expand=YES)
+        # 事件处理函数耗时统计, 需要在绑定事件和创建回调之前包装, 是否启用由配置instrument决定
+        self.handler_timer = HandlerTimer()
+        self.handler_timer.instrument(self, ['start_pick', 'get_winners', 'check_award_selected', 'update_award_status',
+                                             'show_results', 'revoke_selected_winner', 'load_data', 'resize_background',
+                                             'finish_resize_background', 'poll_load_data', 'render_results_batch',
+                                             'draw_batch', 'show_next_page', 'poll_shared_state', 'update_save_indicator'])
+        self.draw_profiler = DrawProfiler() # 按Ctrl+P对下一次抽奖做性能分析
+        self.load_started = None # 本次后台读取开始时间, 用于统计读取总耗时
+        self.lag_monitor = LagMonitor(self.master, self.handler_timer, callback=self.update_lag_overlay) # 事件循环延迟探针
+        self.lag_overlay = None # 按F12显示的延迟诊断浮层
         self.is_all_participants = ttk.BooleanVar(value=False) # 是否所有人都参加
         self.is_allow_reserve = ttk.BooleanVar(value=False) # 是否允许内定
-        self.participants = pd.DataFrame(columns=['Name']) # 所有抽奖参与者
-        self.participants_not_win = pd.DataFrame(columns=['Name']) # 尚未中奖参与者        
-        self.awards = pd.DataFrame(columns=['Award', 'Quota']) # 奖项信息
-        self.winners = pd.DataFrame(columns=['Award', 'Name']) # 获奖者
-        self.winners_reserve = pd.DataFrame(columns=['Award', 'Name']) # 内定获奖者
+        self.engine = None # 抽奖核心逻辑, 保存参与者、奖项、中奖者和内定名单, 后台模块加载完成后创建
+        self.startup_timings = {'import': time.perf_counter() - STARTUP_TIME} # 启动各阶段耗时(秒)
         self.display_interval = 100 # 随机名单切换时间， 可修改
         self.in_progress = False # 是否正在抽奖， 用于决定抽奖按钮功能
         self.selected_participants = None # 随机抽取的参与者
@@ -30,9 +113,57 @@ class LotteryApp(ttk.Frame):
         self.current_award = None # 选中奖项
         self.current_award_quota = 0 # 选中奖项配额
         self.current_award_remain_quota = 0 # 选中奖项剩余配额  
+        self.results_pending = deque() # 尚未应用到结果表格的变化
+        self.results_batch_size = 500 # 结果表格每批渲染行数
+        self.results_render_job = None
+        self.results_label = None # 结果页在第一次打开时才创建
+        self.reveal_pages = deque() # 批量抽奖结果, 每次按回车或空格显示一页
+        self.reveal_page_size = 10 # 每页显示人数
+        self.rolling_names = [] # 滚动显示用的打乱后的候选名单(环形缓冲)
+        self.rolling_index = 0 # 环形缓冲当前位置
+        self.rolling_buffer_size = 2000 # 环形缓冲最多保存的名字数
+        self.frame_scheduler = FrameScheduler(self.master, self.display_interval, self.get_winners) # 滚动动画调度
+        self.last_frame_stats = None # 上一次抽奖的动画帧统计
+        self.loading_thread = None # 后台读取数据的线程
+        self.reload_pending = False # 读取期间又需要重新读取(例如修改了数据文件夹), 当前读取完成后再读取一次
+        self.load_progress = (0, 0) # 后台读取进度: (已读行数, 总行数)
+        self.load_result = None # 后台读取结果: 新的LotteryEngine或异常
+        self.broadcast_server = None # 局域网广播服务, broadcast_port为0时不启动
+        self.preload_thread = threading.Thread(target=preload_modules, daemon=True)
+        self.preload_thread.start()
         self.load_settings()
         self.setup_ui()
+        self.apply_settings()
+        self.startup_timings['ui'] = time.perf_counter() - STARTUP_TIME
+        # 先显示抽奖页, 模块加载完成后再读取背景和数据
+        self.after(10, self.finish_startup)
+
+    def finish_startup(self):
+        if self.preload_thread.is_alive():
+            self.after(20, self.finish_startup)
+            return
+        self.startup_timings['preload'] = time.perf_counter() - STARTUP_TIME
+        self.load_background_image()
         self.load_data()
+
+    def bind_keys(self):
+        # 数据加载完成后才响应快捷键
+        # 按F10重置
+        self.master.bind('<F10>', self.reset_lottery)
+        # 绑定空格和回车键按下事件到 start_pick 方法
+        self.master.bind('<Return>', self.start_pick)  # 回车键
+        self.master.bind('<space>', self.start_pick)   # 空格键
+        # 按Ctrl+S把中奖日志合并保存到winners.xlsx, 关闭窗口时也会自动合并
+        self.master.bind('<Control-s>', self.save_winners)
+        # 按F7一次抽完当前奖项剩余名额, 按F8按顺序一次抽完所有奖项
+        self.master.bind('<F7>', self.draw_current_award)
+        self.master.bind('<F8>', self.draw_all_awards)
+        # 按Ctrl+F查看上一次抽奖的动画帧统计
+        self.master.bind('<Control-f>', self.show_frame_stats)
+        # 按Ctrl+P对下一次抽奖做cProfile性能分析
+        self.master.bind('<Control-p>', self.arm_draw_profiler)
+        # 按F12显示/隐藏事件循环延迟诊断
+        self.master.bind('<F12>', self.toggle_lag_overlay)
  
     def load_settings(self):
         self.param_file_path = Path('config.json')
@@ -46,6 +177,9 @@ class LotteryApp(ttk.Frame):
                 "data_folder": "data",            
                 "default_count": 1,
                 "display_interval": 50,
+                "storage": "excel",
+                "broadcast_port": 0,
+                "instrument": False,
                 "is_allow_reserve": False
             }
             with open(self.param_file_path, 'w', encoding='utf-8') as f:
@@ -61,16 +195,59 @@ class LotteryApp(ttk.Frame):
         self.bg_imge_path = os.path.join(self.data_folder, 'background.jpg') #背景图片路
         self.default_count = self.config.get('default_count', 1) #默认抽取人数
         self.display_interval = self.config.get('display_interval', 100) #名单切换时间
+        self.storage = self.config.get('storage', 'excel') #存储方式: excel, sqlite 或 shared
+        self.broadcast_port = int(self.config.get('broadcast_port', 0)) #广播服务端口, 0为不启动
+        self.handler_timer.enabled = bool(self.config.get('instrument', False)) #是否统计事件处理耗时
         self.is_allow_reserve.set(self.config.get('is_allow_reserve', False)) #是否允许内定
 
         
-    def apply_settings(self):    
-        self.master.geometry(f"{self.config.get('width', 1024)}x{self.config.get('height', 768)}")
-        self.update_draw_count_entry(self.default_count) 
-        self.draw_count_scale.set(self.default_count)
-        self.title_label.config(text=self.title)
-        self.master.title(self.software_name)
-        self.is_allow_reserve_checkbutton.config()
+    def apply_settings(self, changed=None):    
+        # changed为发生变化的配置项, None表示全部应用
+        def is_changed(*keys):
+            return changed is None or any(key in changed for key in keys)
+        if is_changed('width', 'height'):
+            self.master.geometry(f"{self.config.get('width', 1024)}x{self.config.get('height', 768)}")
+        if is_changed('default_count'):
+            self.update_draw_count_entry(self.default_count) 
+            self.draw_count_scale.set(self.default_count)
+        if is_changed('title'):
+            self.title_label.config(text=self.title)
+        if is_changed('software_name'):
+            self.master.title(self.software_name)
+        if is_changed('display_interval'):
+            # 正在滚动时立即使用新的间隔
+            self.frame_scheduler.set_interval(self.display_interval)
+        if is_changed('broadcast_port'):
+            self.update_broadcast_server()
+
+
+    def update_broadcast_server(self):
+        # 端口变化时重新启动广播服务
+        server = self.broadcast_server
+        if server is not None and server.running and server.port == self.broadcast_port:
+            return
+        if server is not None:
+            server.stop()
+            self.broadcast_server = None
+        if not self.broadcast_port:
+            return
+        from broadcast_server import BroadcastServer
+        server = BroadcastServer(port=self.broadcast_port)
+        try:
+            server.start()
+        except OSError as e:
+            messagebox.showerror("错误", f"广播服务启动失败: {e}")
+            return
+        self.broadcast_server = server
+        print(f'广播服务已启动: http://<本机IP>:{server.port}/')
+        if self.engine is not None:
+            self.update_award_status()
+
+
+    def publish(self, kind, **data):
+        # 把滚动名单、中奖结果和奖项状态推送给广播服务的客户端
+        if self.broadcast_server is not None:
+            self.broadcast_server.publish(kind, **data)
         
     
     def setup_ui(self):
@@ -80,48 +257,96 @@ class LotteryApp(ttk.Frame):
         # 抽奖标签
         self.lottery_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.lottery_tab, text='抽奖')
-        self.load_background_image()
         self.setup_lottery_ui()        
 
 
+        # 其余标签在第一次选中时才创建内容
         # 抽奖结果标签
         self.result_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.result_tab, text='抽奖结果')
-        self.setup_result_ui()
-
 
         # 设置标签
         self.settings_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.settings_tab, text='设置')
-        self.setup_settings_ui()
-
 
         # 使用说明
         self.about_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.about_tab, text='使用说明')
-        self.setup_about_ui()
+
+        self.tab_builders = {
+            str(self.result_tab): self.setup_result_ui,
+            str(self.settings_tab): self.setup_settings_ui,
+            str(self.about_tab): self.setup_about_ui
+        }
 
         self.notebook.bind("<<NotebookTabChanged>>", self.refresh_results_if_needed)      
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
 
  
     def load_background_image(self):
+        from PIL import Image
+        # 更换数据文件夹时先移除旧的背景
+        if hasattr(self, 'bg_label'):
+            self.master.unbind("<Configure>")
+            if self.bg_resize_job is not None:
+                self.master.after_cancel(self.bg_resize_job)
+            self.bg_label.destroy()
+            del self.bg_label
         if os.path.exists(self.bg_imge_path):
-            self.bg_image = Image.open(self.bg_imge_path)
-            self.bg_image = self.bg_image.resize((self.master.winfo_width(), self.master.winfo_height()),
-                                                  Image.LANCZOS)
-            self.bg_photo = ImageTk.PhotoImage(self.bg_image)
+            # 背景图片只从磁盘解码一次, 之后都从内存缩放
+            self.bg_source = Image.open(self.bg_imge_path)
+            self.bg_source.load()
+            self.bg_cache = OrderedDict() # 已缩放尺寸的LRU缓存: (宽, 高) -> PhotoImage
+            self.bg_cache_size = 4
+            self.bg_resize_delay = 150 # 窗口大小停止变化后再做高质量缩放(ms)
+            self.bg_resize_job = None
+            self.bg_size = (self.master.winfo_width(), self.master.winfo_height())
+            self.bg_photo = self.render_background(self.bg_size, final=True)
             self.bg_label = tk.Label(self.lottery_tab, image=self.bg_photo)
             self.bg_label.place(x=0, y=0, relwidth=1, relheight=1)
+            self.bg_label.lower() # 放在其他控件下面
             # 绑定窗口大小变化事件
             self.master.bind("<Configure>", self.resize_background)
 
 
+    def render_background(self, size, final):
+        from PIL import Image, ImageTk
+        if final and size in self.bg_cache:
+            self.bg_cache.move_to_end(size)
+            return self.bg_cache[size]
+        # 拖动过程中用快速算法, 停止后再用LANCZOS
+        resample = Image.LANCZOS if final else Image.BILINEAR
+        photo = ImageTk.PhotoImage(self.bg_source.resize(size, resample))
+        if final:
+            self.bg_cache[size] = photo
+            if len(self.bg_cache) > self.bg_cache_size:
+                self.bg_cache.popitem(last=False)
+        return photo
+
+
     def resize_background(self, event):
-        if os.path.exists(self.bg_imge_path):
-            self.bg_image = Image.open(self.bg_imge_path)
-            self.bg_image = self.bg_image.resize((event.width, event.height), Image.LANCZOS)
-            self.bg_photo = ImageTk.PhotoImage(self.bg_image)
-            self.bg_label.config(image=self.bg_photo)
+        # <Configure>会被所有子控件触发, 只处理顶层窗口大小的变化
+        if event.widget is not self.master:
+            return
+        size = (event.width, event.height)
+        if size == self.bg_size:
+            return
+        self.bg_size = size
+        if self.bg_resize_job is not None:
+            self.master.after_cancel(self.bg_resize_job)
+        if size in self.bg_cache:
+            self.bg_resize_job = None
+            self.bg_photo = self.render_background(size, final=True)
+        else:
+            self.bg_photo = self.render_background(size, final=False)
+            self.bg_resize_job = self.master.after(self.bg_resize_delay, self.finish_resize_background)
+        self.bg_label.config(image=self.bg_photo)
+
+
+    def finish_resize_background(self):
+        self.bg_resize_job = None
+        self.bg_photo = self.render_background(self.bg_size, final=True)
+        self.bg_label.config(image=self.bg_photo)
 
 
     def setup_lottery_ui(self):
@@ -129,9 +354,6 @@ class LotteryApp(ttk.Frame):
         # self.reset_button = ttk.Button(self.lottery_tab, text="重置", command=self.reset_lottery, bootstyle=DANGER)
         # self.lottery_tab.pack_propagate(False)  # 防止框架根据子控件调整大小
         # self.reset_button.grid(row=0, column=0,padx=10,pady=10)  # 放在右上角) 
-        # 按F10重置
-        self.master.bind('<F10>', self.reset_lottery)
-
         # 软件名称显示
         self.title_label = ttk.Label(self.lottery_tab, text="", font=("FangSong", 30),bootstyle='danger')
         self.title_label.pack(side=ttk.TOP, pady=20)   
@@ -186,22 +408,16 @@ class LotteryApp(ttk.Frame):
         # 抽奖按钮
         # self.draw_button = ttk.Button(self.lottery_tab, text="开始", bootstyle='primary', command=self.start_pick)
         # self.draw_button.pack(side=ttk.TOP, pady=10)
-        # 绑定空格和回车键按下事件到 start_pick 方法
-        self.master.bind('<Return>', self.start_pick)  # 回车键
-        self.master.bind('<space>', self.start_pick)   # 空格键
-
         # 结果显示
         self.result_label = ttk.Label(self.lottery_tab, text="", font=("FangSong", 15), bootstyle=DANGER)
         self.result_label.pack(side=ttk.TOP, pady=20)  
         self.result_label.config(text='') 
+
+        # 后台读取数据时显示进度
+        self.load_progress_bar = ttk.Progressbar(self.lottery_tab, mode='determinate', maximum=100, bootstyle='success-striped')
         
 
     def load_data(self):    
-        participants_path = os.path.join(self.data_folder, 'participants.xlsx')
-        awards_path = os.path.join(self.data_folder, 'awards.xlsx')
-        winners_path = os.path.join(self.data_folder, 'winners.xlsx')
-        winners_reserve_path = os.path.join(self.data_folder, 'winners_reserve.xlsx')
-        
         # 检查是否为VIP
         try:
             with open('SN.txt', 'r', encoding='utf-8' ) as file:
@@ -215,24 +431,92 @@ class LotteryApp(ttk.Frame):
             self.is_VIP = False
             self.is_allow_reserve.set(False) #不允许内定 
 
-        # 加载或创建Excel文件
-        self.load_or_create_excel(participants_path, {'Name': ['参与者1', '参与者2', '参与者3']})
-        self.load_or_create_excel(awards_path, {'Award': ['一等奖', '二等奖', '三等奖'], 'Quota': [1, 2, 3]})            
-
-        self.awards = pd.read_excel(awards_path)
-        if os.path.exists(winners_path):
-            self.winners = pd.read_excel(winners_path)
-        self.participants = pd.read_excel(participants_path)  
-        # print(self.is_allow_reserve.get())
-        if self.is_allow_reserve.get():
-            self.load_or_create_excel(winners_reserve_path, {'Award': [], 'Name': []})     
-            self.winners_reserve = pd.read_excel(winners_reserve_path)  
-        else:
-            if os.path.exists(winners_reserve_path):
-                os.remove(winners_reserve_path)     
-        self.award_option_menu['values'] = self.awards['Award'].unique().tolist()
+        if self.loading_thread is not None:
+            # 正在读取的是旧的设置, 读取完成后按新的设置重新读取
+            self.reload_pending = True
+            return
+        self.reload_pending = False
+        # 在后台线程中用新的引擎分块读取数据, 读取期间界面保持可操作, 读取完成后再整体替换
+        from lottery_engine import LotteryEngine
+        old_engine = self.engine
+        new_engine = LotteryEngine()
+        data_folder = self.data_folder
+        allow_reserve = self.is_allow_reserve.get()
+        storage = self.storage
+        self.load_progress = (0, 0)
+        self.load_result = None
+
+        def update_progress(done, total):
+            self.load_progress = (done, total)
+
+        def run():
+            try:
+                if old_engine is not None:
+                    old_engine.worker.flush() # 等待旧数据写入完成
+                new_engine.load(data_folder, allow_reserve, progress=update_progress, storage=storage)
+                self.load_result = new_engine
+            except Exception as e:
+                self.load_result = e
+
+        self.loading_thread = threading.Thread(target=run, daemon=True)
+        self.load_started = time.perf_counter()
+        self.loading_thread.start()
+        self.load_progress_bar['value'] = 0
+        self.load_progress_bar.pack(side=ttk.BOTTOM, fill=ttk.X, padx=20, pady=10)
+        self.after(50, self.poll_load_data)
+
+
+    def poll_load_data(self):
+        if self.loading_thread.is_alive():
+            done, total = self.load_progress
+            if total:
+                self.load_progress_bar['value'] = done * 100 / total
+                self.result_label.config(text=f"正在读取参与者名单 {done}/{total}")
+            self.after(50, self.poll_load_data)
+            return
+        self.loading_thread = None
+        if self.handler_timer.enabled:
+            self.handler_timer.record('load_data_background', (time.perf_counter() - self.load_started) * 1000)
+        self.load_progress_bar.pack_forget()
+        self.result_label.config(text='')
+        if isinstance(self.load_result, Exception):
+            if self.reload_pending:
+                self.load_data()
+                return
+            messagebox.showerror("错误", f"读取数据失败: {self.load_result}")
+            return
+        # 一次性替换为新数据, 旧引擎在后台保存后删除会话标记并关闭数据库连接
+        old_engine = self.engine
+        self.engine = self.load_result
+        if old_engine is not None:
+            old_engine.detach()
+        self.engine.subscribe(self.on_winners_changed)
+        self.on_winners_changed('reload', list(self.engine.winners.index))
+        self.award_option_menu['values'] = self.engine.award_names()
         self.update_award_status()
         self.apply_settings()
+        recovery = self.engine.recovery
+        if recovery:
+            self.result_label.config(text=f"检测到上次没有正常退出, 已恢复{recovery['winners']}名中奖者"
+                                          f"(回放{recovery['events']}条记录, 用时{recovery['seconds'] * 1000:.0f}ms)")
+        if 'data' not in self.startup_timings:
+            # 第一次加载完成
+            self.bind_keys()
+            self.update_save_indicator()
+            self.poll_shared_state()
+            self.lag_monitor.start()
+            self.startup_timings['data'] = time.perf_counter() - STARTUP_TIME
+            print('启动耗时: ' + ', '.join(f'{phase} {seconds * 1000:.0f}ms' for phase, seconds in self.startup_timings.items()))
+        if self.reload_pending:
+            self.load_data()
+
+
+    def is_loading(self):
+        # 读取数据期间不能抽奖或修改中奖名单
+        if self.loading_thread is not None:
+            self.result_label.config(text="注意：正在读取数据, 请稍候!")
+            return True
+        return False
  
 
 
@@ -244,15 +528,9 @@ class LotteryApp(ttk.Frame):
         self.draw_count_entry.config(state='readonly')  # 恢复只读状态
 
 
-    def load_or_create_excel(self, file_path, data):
-        directory = os.path.dirname(file_path)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-        if not os.path.exists(file_path):
-            pd.DataFrame(data).to_excel(file_path, index=False, engine='openpyxl')
-
-
     def reset_lottery(self, event = None):
+        if self.is_loading():
+            return
         # 弹出确认框
         confirm = messagebox.askyesno("确认", "确定要重置抽奖吗？")
         if not confirm:
@@ -260,16 +538,9 @@ class LotteryApp(ttk.Frame):
          # 重置抽取人数输入框
         self.update_draw_count_entry(self.default_count)
 
-        # 重置中奖者名单
-        self.winners = pd.DataFrame(columns=['Award', 'Name'])
-
-        # 重命名现有的winners文件（如果存在）
-        winners_path = os.path.join(self.data_folder, 'winners.xlsx')
-        new_winners_path = os.path.join(self.data_folder, 'winners_old.xlsx')
-        if os.path.exists(new_winners_path):
-            os.remove(new_winners_path)
-        if os.path.exists(winners_path):
-            os.rename(winners_path, new_winners_path)        
+        # 在内存中重置中奖者名单, 原中奖名单在后台保存为winners_old.xlsx
+        self.engine.reset()
+        self.reveal_pages.clear()
 
         # 清空界面上的显示
         self.name_label.config(text='')
@@ -277,8 +548,11 @@ class LotteryApp(ttk.Frame):
         self.is_all_participants.set(False)
         # self.award_option_menu.set('请选择奖项')  # 重置奖项选择下拉菜单
 
-        # 重新加载数据
-        self.load_data()
+        # 参与者、奖项或内定名单被修改过时才重新读取数据
+        if self.engine.inputs_changed():
+            self.load_data()
+        else:
+            self.update_award_status()
 
         # 显示重置成功的消息
         messagebox.showinfo("重置", "抽奖已重置！")
@@ -286,21 +560,14 @@ class LotteryApp(ttk.Frame):
 
 
     def update_award_status(self, event = None):
-        self.participants_not_win = self.participants[~self.participants['Name'].isin(self.winners['Name'])]
-        label_text = ''        
-        total_awards =  len(self.awards['Award'].unique().tolist())
-        total_participants = len(self.participants['Name'].unique().tolist())
-        winner_number = len(self.winners['Name'].unique().tolist())
-        participants_not_win_count = 0 if self.participants_not_win.empty else len(self.participants_not_win['Name'].unique().tolist())
-        label_text += f"总奖项{total_awards},总人数{total_participants},已中奖{winner_number}人,未中奖{participants_not_win_count}人"                 
+        status = self.engine.status()
+        label_text = f"总奖项{status['total_awards']},总人数{status['total_participants']},已中奖{status['winner_count']}人,未中奖{status['not_win_count']}人"                 
         self.awards_label.config(text=label_text)
-        for index, row in self.awards.iterrows():
-            award_name = row['Award']
-            quota = row['Quota']
-            used_quota = self.winners[(self.winners['Award'] == award_name) & (self.winners['Name'].notnull())]['Name'].count()
-            remain_quota = quota - used_quota
+        for award_name, quota, remain_quota in status['awards']:
             label_text +=  f"\n{award_name} {quota}/{remain_quota}" 
-        self.results_label.config(text=label_text)
+        if self.results_label is not None:
+            self.results_label.config(text=label_text)
+        self.publish('status', **status)
 
 
     def check_award_selected(self, event=None):
@@ -314,80 +581,185 @@ class LotteryApp(ttk.Frame):
         else:
             self.current_awards_label.config(text=f"正在抽取{self.current_award}")
          # 检查奖项的剩余数量
-        award_index = self.awards[self.awards['Award'] == self.current_award].index
-        self.current_award_quota = self.awards.loc[award_index, 'Quota'].item()
-        used_quota = self.winners[(self.winners['Award'] == self.current_award) & (self.winners['Name'].notnull())]['Name'].count()
-        # used_quota = self.winners[self.winners['Award'] == self.current_award]['Name'].count()
-        self.current_award_remain_quota = self.current_award_quota - used_quota
+        self.current_award_quota = self.engine.ledger.quotas.get(self.current_award, 0)
+        self.current_award_remain_quota = self.engine.remaining(self.current_award)
         self.update_award_status()        
-        if self.current_award_remain_quota >= self.draw_count:            
+        message = self.engine.check(self.current_award, self.draw_count)
+        if message is None:            
             return {'status':True, 'message':'没发现错误'}
         else:
-            return {'status':False, 'message':f'奖项({self.current_award})剩余配额不足！'}
+            return {'status':False, 'message':message}
         
         
 
     def get_winners(self):
-        if self.is_all_participants.get():
-            get_sample_from = self.participants
-        else:
-            get_sample_from = self.participants_not_win
-        
-
     # 循环显示名字，直到再次按下抽奖按钮            
         if self.in_progress:    
-            # self.selected_participants = get_sample_from.sample(n=self.draw_count)
-            # self.current_winners = self.selected_participants['Name'].tolist()                                    
-            # self.name_label.config(text=','.join(self.current_winners))
-            self.name_label.config(text=random.choice(['+', '*', 'v', '-']) * self.draw_count)
-            # 设置定时器，用于快速轮流显示名字
-            self.master.after(self.display_interval, self.get_winners)
-        else:  
-            # 检查是否开启内定功能   
-            if self.is_allow_reserve.get():
-                get_sample_from = get_sample_from[~get_sample_from['Name'].isin(self.winners_reserve['Name'])]
-                match_reserves = self.winners_reserve[(self.winners_reserve['Award'] == self.current_award) & (~self.winners_reserve['Name'].isin(self.winners['Name']))]
-                match_reserves_count = match_reserves['Name'].count()
-                if match_reserves_count > 0:
-                    if match_reserves_count >= self.draw_count:
-                        self.selected_participants = match_reserves.sample(n=self.draw_count)
-                    else:
-                        other_winners = get_sample_from.sample(n=self.draw_count - match_reserves_count)
-                        self.selected_participants =  pd.concat([other_winners, match_reserves], ignore_index=True)
-                else:
-                    self.selected_participants = get_sample_from.sample(n=self.draw_count) 
+            if self.rolling_names:
+                # 每帧只移动环形缓冲的下标
+                size = len(self.rolling_names)
+                names = [self.rolling_names[(self.rolling_index + i) % size] for i in range(self.draw_count)]
+                self.rolling_index = (self.rolling_index + self.draw_count) % size
+                self.name_label.config(text=','.join(names))
             else:
-                self.selected_participants = get_sample_from.sample(n=self.draw_count)
-            self.current_winners = self.selected_participants['Name'].tolist()
+                names = [random.choice(['+', '*', 'v', '-']) * self.draw_count]
+                self.name_label.config(text=names[0])
+            self.publish('rolling', award=self.current_award, names=names)
+            # 下一帧由frame_scheduler按display_interval调度
+        else:  
+            # 抽取并记录中奖, 共享模式下被其他抽奖台抢先时会自动重新抽取
+            try:
+                self.current_winners = self.engine.draw(self.current_award, self.draw_count, self.is_all_participants.get())
+            except ValueError as e:
+                self.name_label.config(text='')
+                self.result_label.config(text=f"注意：{e}")
+                self.check_award_selected()
+                self.draw_profiler.stop(self.data_folder)
+                return
             self.name_label.config(text=','.join(self.current_winners))  
             self.result_label.config(text=f"恭喜 {', '.join(self.current_winners)} 获得{self.current_award}") 
-            # 更新中奖者名单
-            new_winners = pd.DataFrame({'Award': [self.current_award]*len(self.current_winners), 'Name': self.current_winners})
-            self.winners = pd.concat([self.winners, new_winners], ignore_index=True)
+            self.publish('result', award=self.current_award, names=list(self.current_winners))
             self.check_award_selected()
-            # 保存更新后的中奖者名单
-            self.winners.to_excel(os.path.join(self.data_folder, 'winners.xlsx'), index=False)
+            profile_path = self.draw_profiler.stop(self.data_folder)
+            if profile_path:
+                self.result_label.config(text=f"{self.result_label.cget('text')}\n性能分析已保存到{profile_path}")
     
 
     
 
     def start_pick(self, event = None):
+        if self.is_loading():
+            return
+        # 批量抽奖结果尚未显示完时, 先显示下一页
+        if self.reveal_pages:
+            self.show_next_page()
+            return
         # print(f'全体人员参与开关状态： {self.is_all_participants.get()}')
+        if self.in_progress:
+            # 滚动中总是可以停止, 按开始时的奖项和人数抽取; 名额在滚动期间被其他抽奖台抽完时由get_winners显示错误
+            self.in_progress = False
+            # self.draw_button.config(text='开始')                
+            # 立即停止滚动并抽取, 不用等到下一帧
+            self.frame_scheduler.stop()
+            self.last_frame_stats = self.frame_scheduler.stats()
+            self.get_winners()
+            return
         result = self.check_award_selected()        
         if result['status']:
-            if self.in_progress:
-                self.in_progress = False
-                # self.draw_button.config(text='开始')                
-            else:
-                self.in_progress = True
-                # self.draw_button.config(text='结束')
-                self.result_label.config(text=f"正在抽取{self.draw_count}名{self.current_award}")
-                self.get_winners() 
+            # 先准备滚动名单, 出错时不会留下抽奖中的状态
+            self.prepare_rolling_names()
+            self.in_progress = True
+            # self.draw_button.config(text='结束')
+            self.result_label.config(text=f"正在抽取{self.draw_count}名{self.current_award}")
+            self.draw_profiler.start()
+            self.frame_scheduler.set_interval(self.display_interval)
+            self.frame_scheduler.start()
         else:
              self.result_label.config(text=f"注意：{result['message']}")   
 
 
 
+    def show_frame_stats(self, event=None):
+        stats = self.last_frame_stats
+        if not stats:
+            messagebox.showinfo("动画统计", "还没有抽奖记录")
+            return
+        messagebox.showinfo("动画统计", f"目标帧间隔: {self.display_interval}ms\n"
+                                       f"帧数: {stats['frames']}\n"
+                                       f"平均帧间隔: {stats['mean_ms']:.1f}ms\n"
+                                       f"p99帧间隔: {stats['p99_ms']:.1f}ms\n"
+                                       f"最大帧间隔: {stats['max_ms']:.1f}ms\n"
+                                       f"丢帧数: {stats['dropped_frames']}")
+
+
+    def toggle_lag_overlay(self, event=None):
+        if self.lag_overlay is None:
+            self.lag_overlay = ttk.Label(self.master, text='', font=("Consolas", 11), bootstyle='inverse-dark', justify=tk.LEFT)
+            self.lag_overlay.place(relx=1.0, x=-10, y=10, anchor='ne')
+            self.update_lag_overlay(self.lag_monitor, force=True)
+        else:
+            self.lag_overlay.destroy()
+            self.lag_overlay = None
+
+
+    def update_lag_overlay(self, monitor, force=False):
+        # 每次心跳后调用, 浮层每5次心跳或发生卡顿时才更新, 避免探针本身占用事件循环
+        if self.lag_overlay is None:
+            return
+        if not force and monitor.ticks % 5 and monitor.current_lag_ms < monitor.stall_ms:
+            return
+        text = f"事件循环延迟: 当前 {monitor.current_lag_ms:.0f}ms  最大 {monitor.worst_lag_ms:.0f}ms\n卡顿(>{monitor.stall_ms}ms): {monitor.stall_count}次"
+        stall = monitor.last_stall
+        if stall:
+            text += f"\n最近卡顿: {stall['time']} 延迟{stall['lag_ms']:.0f}ms, {stall['handler']} 耗时{stall['handler_ms']:.0f}ms"
+        self.lag_overlay.config(text=text)
+        self.lag_overlay.lift()
+
+
+    def arm_draw_profiler(self, event=None):
+        self.draw_profiler.arm()
+        self.result_label.config(text="下一次抽奖将记录性能分析")
+
+
+    def prepare_rolling_names(self):
+        # 开始抽奖时只打乱一次候选名单, 与抽奖结果无关, 仅用于滚动显示
+        # 直接均匀抽取名字, 不调用pool.sample: 按权重抽样会建立别名表, 使之后的抽奖结果依赖滚动的时机, 审计时无法重现
+        pool = self.engine.pool
+        source = pool.roster if self.is_all_participants.get() else pool.names
+        names = random.sample(source, min(len(source), self.rolling_buffer_size))
+        # 权重为0的人员不会被抽中, 不显示; 没有可显示的人员时显示符号
+        self.rolling_names = [name for name in names if pool.weight(name) > 0]
+        self.rolling_index = 0
+
+
+    def draw_current_award(self, event=None):
+        if self.is_loading():
+            return
+        self.current_award = self.award_var.get()
+        if not self.current_award or self.current_award not in self.engine.award_names():
+            self.result_label.config(text="注意：请选择奖项!")
+            return
+        self.draw_batch([self.current_award])
+
+
+    def draw_all_awards(self, event=None):
+        self.draw_batch(None)
+
+
+    def draw_batch(self, awards):
+        if self.in_progress or self.is_loading():
+            return
+        count = sum(self.engine.remaining(award) for award in (awards or self.engine.award_names()))
+        if count <= 0:
+            self.result_label.config(text="注意：没有剩余名额!")
+            return
+        if not messagebox.askyesno("确认", f"确定要一次抽取{'、'.join(awards or ['所有奖项'])}的全部剩余名额({count}人)吗？"):
+            return
+        try:
+            draws = self.engine.draw_all(awards, self.is_all_participants.get())
+        except ValueError as e:
+            self.result_label.config(text=f"注意：{e}")
+            return
+        # 结果分页, 每次按回车或空格显示一页
+        self.reveal_pages = deque(
+            (award, names[i:i + self.reveal_page_size])
+            for award, names in draws
+            for i in range(0, len(names), self.reveal_page_size)
+        )
+        self.update_award_status()
+        self.show_next_page()
+
+
+    def show_next_page(self):
+        award, names = self.reveal_pages.popleft()
+        lines = [','.join(names[i:i + 5]) for i in range(0, len(names), 5)]
+        self.current_awards_label.config(text=f"{award}")
+        self.name_label.config(text='\n'.join(lines))
+        remain = f"(还有{len(self.reveal_pages)}页, 按回车或空格继续)" if self.reveal_pages else ""
+        self.result_label.config(text=f"恭喜以上{len(names)}人获得{award}{remain}")
+        self.publish('result', award=award, names=list(names))
+
+
     def setup_result_ui(self):
         # 创建汇总信息标签
         self.results_info = ttk.Labelframe(self.result_tab, text='抽奖结果', padding=10)        
@@ -424,8 +796,14 @@ class LotteryApp(ttk.Frame):
         # self.notebook.select(self.result_tab)
 
     def refresh_results_if_needed(self, event):
+        # 第一次选中的标签页先创建内容
+        builder = self.tab_builders.pop(self.notebook.select(), None)
+        if builder is not None:
+            builder()
+            if builder == self.setup_result_ui and self.engine is not None:
+                self.update_award_status()
         # 检查当前激活的标签页是否是结果页
-        if self.notebook.index(self.notebook.select()) == 1:  # 索引1对应于 "抽奖结果" 标签页
+        if self.notebook.index(self.notebook.select()) == 1 and self.engine is not None:  # 索引1对应于 "抽奖结果" 标签页
             # 更新结果数据
             self.show_results()
 
@@ -444,15 +822,39 @@ class LotteryApp(ttk.Frame):
             # 更新结果数据
             self.show_results()
 
+    def on_winners_changed(self, action, winner_ids):
+        # 把引擎中中奖名单的变化记录下来, 显示结果页时再应用到表格
+        if action == 'reload':
+            # 重新加载后结果表格需要整体重建
+            self.results_pending = deque([('clear', None)])
+        action = 'delete' if action == 'revoke' else 'insert'
+        self.results_pending.extend((action, winner_id) for winner_id in winner_ids)
+
     def show_results(self):
-         # 清空结果表格
-        for i in self.results_table.get_children():
-            self.results_table.delete(i)
-        # 插入抽奖结果
-        for index, row in self.winners.iterrows():
-            self.results_table.insert('', 'end', values=(row['Award'], row['Name']))   
+        # 只把上次显示之后的新增和撤销应用到表格, 行号即表格的iid
+        if self.results_render_job is None:
+            self.render_results_batch()
+
+    def render_results_batch(self):
+        # 大量数据分批渲染, 每批之间让出事件循环, 避免切换标签时界面卡死
+        self.results_render_job = None
+        for _ in range(min(self.results_batch_size, len(self.results_pending))):
+            action, winner_id = self.results_pending.popleft()
+            if action == 'clear':
+                self.results_table.delete(*self.results_table.get_children())
+            elif action == 'delete':
+                if self.results_table.exists(str(winner_id)):
+                    self.results_table.delete(str(winner_id))
+            elif winner_id in self.engine.winners.index and not self.results_table.exists(str(winner_id)):
+                row = self.engine.winners.loc[winner_id]
+                self.results_table.insert('', 'end', iid=str(winner_id), values=(row['Award'], row['Name']))
+        if self.results_pending:
+            self.results_render_job = self.master.after(1, self.render_results_batch)
 
     def revoke_selected_winner(self):
+        if self.loading_thread is not None:
+            messagebox.showerror("错误", "正在读取数据, 请稍候")
+            return
         # 获取选中的行
         selected_row = self.results_table.selection()
         if not selected_row:
@@ -464,24 +866,66 @@ class LotteryApp(ttk.Frame):
         name = self.results_table.item(selected_row, 'values')[1]
 
         # 根据奖项和名字查找中奖者并从 winners DataFrame 中删除
-        to_revoke = self.winners[(self.winners['Award'] == award) & (self.winners['Name'] == name)]
-        if to_revoke.empty:
+        if not self.engine.revoke(award, name):
             messagebox.showerror("错误", "未找到匹配的中奖者")
             return
 
-        # 删除匹配的行
-        self.winners = self.winners.drop(to_revoke.index)
-
         # 刷新显示结果
         self.update_award_status()
         self.show_results()
 
-        # 保存更新后的中奖者名单
-        self.winners.to_excel(os.path.join(self.data_folder, 'winners.xlsx'), index=False)
         messagebox.showinfo("操作成功", f"已撤销 {award} - {name}")
 
 
 
+    def save_winners(self, event=None):
+        if self.is_loading():
+            return
+        # 在后台写入, 窗口标题中的*消失即保存完成
+        self.engine.save(wait=False)
+        self.result_label.config(text=f"中奖名单正在保存到{self.engine.path('winners.xlsx')}")
+
+
+    def update_save_indicator(self):
+        # winners.xlsx尚未更新时在窗口标题后显示*, 写入失败时显示提示
+        title = self.software_name
+        if self.engine.worker.error is not None:
+            title += ' (中奖名单保存失败, 已记录在日志中)'
+        elif self.engine.unsaved:
+            title += ' *'
+        if self.master.title() != title:
+            self.master.title(title)
+        self.after(300, self.update_save_indicator)
+
+
+    def poll_shared_state(self):
+        # 共享模式下定时同步其他抽奖台的抽奖和撤销
+        if self.loading_thread is None and self.engine.sync():
+            self.update_award_status()
+            if self.notebook.select() == str(self.result_tab):
+                self.show_results()
+        self.after(200, self.poll_shared_state)
+
+
+    def on_close(self):
+        try:
+            if self.engine is not None:
+                # 等待后台写入完成, 并清除会话标记
+                self.engine.close()
+        except Exception as e:
+            # 中奖日志仍然完整保留, 下次启动时会回放
+            messagebox.showerror("错误", f"保存中奖名单失败: {e}")
+        if self.broadcast_server is not None:
+            self.broadcast_server.stop()
+        if self.handler_timer.enabled:
+            # 事件处理耗时统计保存到数据文件夹
+            try:
+                self.handler_timer.dump(os.path.join(self.data_folder, 'handler_timings.json'), {'event_loop': self.lag_monitor.summary()})
+            except OSError as e:
+                print(f'保存耗时统计失败: {e}')
+        self.master.destroy()
+
+
     def setup_settings_ui(self):
         # 配置信息
         self.setting_info = ttk.Labelframe(self.settings_tab, text='配置信息', padding=10)
@@ -495,7 +939,9 @@ class LotteryApp(ttk.Frame):
             ('窗体高度', 'height'),
             ('数据文件夹名', 'data_folder'),
             ('默认抽取人数', 'default_count'),
-            ('滚动间隔时间(ms)', 'display_interval')
+            ('滚动间隔时间(ms)', 'display_interval'),
+            ('存储方式(excel/sqlite/shared)', 'storage'),
+            ('广播端口(0为不启动)', 'broadcast_port')
         ]
 
         row = 0
@@ -508,7 +954,7 @@ class LotteryApp(ttk.Frame):
             entry_var = tk.StringVar()
             entry = ttk.Entry(self.setting_info, textvariable=entry_var)
             entry.grid(row=row, column=col+1, padx=5, pady=2, sticky=tk.W+tk.E)
-            entry.insert(0, self.config.get(conf_key, ''))
+            entry.insert(0, self.config.get(conf_key, {'storage': 'excel', 'broadcast_port': 0}.get(conf_key, '')))
             
             # 保存每个entry_var的引用，以便在save_settings中使用
             setattr(self, f'setting_{conf_key}_entry', entry_var)
@@ -547,6 +993,15 @@ class LotteryApp(ttk.Frame):
                         errors.append(f"{desc} 必须大于0")
                 except ValueError:
                     errors.append(f"{desc} 必须是数字")
+            elif conf_key == 'broadcast_port':
+                try:
+                    value = int(value)
+                    if not 0 <= value <= 65535:
+                        errors.append(f"{desc} 必须在0到65535之间")
+                except ValueError:
+                    errors.append(f"{desc} 必须是数字")
+            elif conf_key == 'storage' and value not in ['excel', 'sqlite', 'shared']:
+                errors.append(f"{desc} 只能是excel、sqlite或shared")
             
             setting_params[conf_key] = value
 
@@ -554,12 +1009,22 @@ class LotteryApp(ttk.Frame):
             messagebox.showerror("错误", "\n".join(errors))
         else:
             setting_params['is_allow_reserve'] = self.is_allow_reserve.get()
+            # 保留设置页上没有的配置项(例如instrument)
+            old_config = self.config
+            new_config = dict(old_config)
+            new_config.update(setting_params)
+            changed = {key for key in new_config if str(new_config[key]) != str(old_config.get(key))}
             try:
                 with open(self.param_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(setting_params, f)
+                    json.dump(new_config, f)
                 messagebox.showinfo("保存", "保存成功")
+                # 只应用变化的配置, 只有数据相关的配置变化时才重新读取数据
                 self.load_settings()
-                self.load_data()    
+                self.apply_settings(changed)
+                if 'data_folder' in changed:
+                    self.load_background_image()
+                if changed & {'data_folder', 'storage', 'is_allow_reserve'}:
+                    self.load_data()    
             except Exception as e:
                 messagebox.showerror("错误", str(e))
 
@@ -570,16 +1035,27 @@ class LotteryApp(ttk.Frame):
         self.about_info.pack(side=tk.TOP, fill=tk.X, pady=10, padx=10)
         # 使用说明标签
         about_string = f'''
-        1. 可以通过设置页修改标题， 窗口大小，数据文件夹名称，默认抽取人数，滚动间隔时间等信息。\n
+        1. 可以通过设置页修改标题， 窗口大小，数据文件夹名称，默认抽取人数，滚动间隔时间，存储方式等信息。\n
         2. 重启软件不会清空中奖者名单， 重新抽奖需要点击左上角的重置按钮来清空中奖者名单。\n
         3. 可以替换{self.data_folder}文件夹中的background.jpg来更换背景图片。\n        
         4. 通过更新 {os.path.join(self.data_folder, 'awards.xlsx')} 文件来更新奖项信息。\n
-        5. 通过更新 {os.path.join(self.data_folder, 'participants.xlsx')} 文件来更新参与抽奖人员信息。\n
+        5. 通过更新 {os.path.join(self.data_folder, 'participants.xlsx')} 文件来更新参与抽奖人员信息(也可以使用participants.csv)。\n
         6. 拖动滑块可以修改一次抽取人数。\n
         7. 默认仅未中奖人员参与抽奖， 如果需要所有人员参加抽奖可勾选 {self.is_all_participants_checkbutton.cget("text")} 开关。\n
         8. 按回车或者空格人员名单开始随机滚动， 再次按回车或者空格名单停止滚动并显示中奖者名单。\n
         9. 抽奖结果页可以查看或者撤销中奖名单。\n        
         10. 按F10重置抽奖。\n        
+        11. 每次抽奖结果会立即记录到winners_journal.jsonl, 并在后台保存到winners.xlsx(窗口标题带*表示尚未保存完), 关闭软件时会等待保存完成, 软件异常退出后再次启动会自动恢复。\n        
+        12. 按F7一次抽完当前奖项的剩余名额, 按F8按顺序一次抽完所有奖项, 之后按回车或空格逐页显示结果。\n        
+        13. 按Ctrl+F查看上一次抽奖的滚动动画帧统计。\n        
+        14. participants.xlsx可以增加Weight列设置抽奖权重(默认1, 0表示不参与抽奖)。\n        
+        15. participants.xlsx增加Department列, awards.xlsx增加DepartmentQuota列(每个部门名额)或DepartmentQuota:部门名列, 即可按部门分配名额抽奖。\n        
+        16. 存储方式设为sqlite时, 数据保存在{os.path.join(self.data_folder, 'lottery.db')}中, Excel文件修改后会自动重新导入, 中奖名单在后台导出到winners.xlsx。\n        
+        17. 设置广播端口(例如8765)后, 同一局域网内的大屏或手机用浏览器打开 http://本机IP:端口/ 即可实时查看滚动名单和中奖结果。\n        
+        18. 多个会场同时抽奖时, 把各抽奖台的数据文件夹设为同一个(本机或共享文件夹), 存储方式设为shared, 同一人不会被两个抽奖台同时抽中, 其他抽奖台的结果会自动同步显示。\n        
+        19. config.json中instrument设为true时统计各事件处理耗时, 关闭软件时保存到handler_timings.json; 按Ctrl+P后下一次抽奖会保存cProfile性能分析(draw_profile_*.prof/.txt)。\n        
+        20. 按F12显示/隐藏事件循环延迟诊断, 包括当前延迟、最大延迟和最近一次卡顿时正在执行的处理函数。\n        
+        21. 每次读取数据时生成随机种子(抽奖期间只记录摘要, 关闭软件或重新读取数据时才公开), 之后每次抽奖按序号使用该种子的随机数流, 序号和结果记录在draw_audit.jsonl中; 运行 python verify_draws.py --data 数据文件夹 可重放并核对全部抽奖结果。\n        
         '''
         self.description_label = ttk.Label(self.about_info, text=about_string)
         self.description_label.pack()